@@ -0,0 +1,128 @@
+"""
+Shared timing, memory and reporting helpers for the benchmark scripts.
+
+Every benchmark produces a list of case dicts with the same keys
+(latency percentiles, throughput, peak memory) so runs can be diffed.
+"""
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+
+
+def peak_rss_mb() -> float:
+    """Process-wide resident-set high-water mark (includes native/TensorFlow memory)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def latency_summary(latencies_s: list) -> dict:
+    lat_ms = np.asarray(latencies_s, dtype=np.float64) * 1000
+    if len(lat_ms) == 0:
+        return {"samples": 0}
+    return {
+        "samples": int(len(lat_ms)),
+        "mean_ms": round(float(lat_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(lat_ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 3),
+        "max_ms": round(float(lat_ms.max()), 3)
+    }
+
+
+def measure(name: str, fn, iterations: int, warmup: int = 3, **params) -> dict:
+    """
+    Time `fn()` `iterations` times after `warmup` untimed calls. Python heap
+    peak is taken from one extra traced call so tracing never skews timings.
+    """
+    for _ in range(warmup):
+        fn()
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+
+    return {
+        "case": name,
+        **params,
+        **latency_summary(latencies),
+        "throughput_per_s": round(iterations / wall, 2) if wall else None,
+        "python_peak_mb": round(python_peak / (1024 * 1024), 2),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def report(benchmark: str, results: list, output: str = None, **settings) -> dict:
+    """Print the run as JSON and optionally write it to `output`."""
+    payload = {"benchmark": benchmark, "environment": environment(), "settings": settings, "results": results}
+    text = json.dumps(payload, indent=2, default=str)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    return payload
+
+
+def use_synthetic_models(face_service, dim: int = 512, faces_per_image: int = 1, seed: int = 0):
+    """
+    Replace detection, embedding and attribute analysis with deterministic
+    stand-ins so the matching and plumbing costs can be measured on a machine
+    without DeepFace weights. Embeddings are derived from the crop bytes, so
+    the same image always maps to the same vector.
+    """
+    def detect_faces(img):
+        height, width = img.shape[:2]
+        step = max(width // (faces_per_image + 1), 1)
+        size = max(min(step, height) // 2, 1)
+        return [
+            {
+                "face": img[:size, i * step:i * step + size],
+                "facial_area": {"x": i * step, "y": 0, "w": size, "h": size},
+                "confidence": 0.99
+            }
+            for i in range(faces_per_image)
+        ]
+
+    def embed(face):
+        digest = int(np.frombuffer(np.ascontiguousarray(face).tobytes()[:8].ljust(8, b"\0"), dtype=np.uint64)[0])
+        return np.random.default_rng((seed, digest % (2 ** 32))).normal(size=dim).astype(np.float32).tolist()
+
+    face_service.detect_faces = detect_faces
+    face_service.represent_faces = lambda faces, model_name=None: [embed(face) for face in faces]
+    face_service.represent_face = lambda face, model_name=None: embed(face)
+    face_service.analyze_face = lambda face, tasks: {"age": "Unknown", "gender": "Unknown", "race": "Unknown", "emotion": "Unknown"}
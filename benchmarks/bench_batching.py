@@ -0,0 +1,103 @@
+"""
+Micro-batching benchmark for embedding inference on CPU.
+
+Runs N concurrent callers against EmbeddingBatcher with max_batch = 1, 8 and 32
+and reports per-call latency percentiles, throughput and the batch sizes the
+scheduler actually formed.
+
+    python -m benchmarks.bench_batching --model Facenet512 --requests 256 --concurrency 32
+    python -m benchmarks.bench_batching --synthetic-models   # no DeepFace weights
+"""
+import argparse
+import threading
+import time
+import numpy as np
+from benchmarks._harness import latency_summary, peak_rss_mb, report
+from services import batcher
+from services.batcher import EmbeddingBatcher
+
+
+def use_synthetic_forward(dim: int = 512, size: int = 32, seed: int = 0):
+    """
+    Replace the batched forward pass with a fixed random projection of the
+    downsampled crops: one matrix product per batch, so larger batches
+    amortise the per-call overhead the way a real model does.
+    """
+    weights = np.random.default_rng(seed).normal(size=(size * size * 3, dim)).astype(np.float32)
+
+    def batch_forward(model_name: str, faces: list):
+        batch = np.stack([
+            face[::max(face.shape[0] // size, 1), ::max(face.shape[1] // size, 1)][:size, :size].reshape(-1)
+            for face in faces
+        ]).astype(np.float32)
+        return (batch @ weights).tolist()
+
+    batcher.batch_forward = batch_forward
+
+
+def run(model_name: str, max_batch: int, window_ms: float, requests: int, concurrency: int):
+    rng = np.random.default_rng(0)
+    faces = [rng.integers(0, 255, size=(160, 160, 3), dtype=np.uint8) for _ in range(16)]
+    embedding_batcher = EmbeddingBatcher(max_batch=max_batch, window_ms=window_ms)
+    latencies = []
+    lock = threading.Lock()
+    per_worker = requests // concurrency
+
+    def worker(worker_id: int):
+        for i in range(per_worker):
+            start = time.perf_counter()
+            embedding_batcher.embed(faces[(worker_id + i) % len(faces)], model_name)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    stats = embedding_batcher.stats()
+    return {
+        "case": f"max_batch={max_batch}",
+        "max_batch": max_batch,
+        "window_ms": window_ms,
+        "concurrency": concurrency,
+        **latency_summary(latencies),
+        "throughput_per_s": round(len(latencies) / wall, 2) if wall else None,
+        "avg_batch_size": stats["avg_batch_size"],
+        "batch_size_histogram": stats["batch_size_histogram"],
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Facenet512")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--dim", type=int, default=512, help="embedding size for --synthetic-models")
+    parser.add_argument("--synthetic-models", action="store_true",
+                        help="replace the forward pass with a deterministic stand-in")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    if args.synthetic_models:
+        use_synthetic_forward(dim=args.dim)
+    # Build + warm the model so the first configuration is not charged for it
+    batcher.batch_forward(args.model, [np.zeros((160, 160, 3), dtype=np.uint8)])
+
+    results = [
+        run(args.model, max_batch, args.window_ms, args.requests, args.concurrency)
+        for max_batch in args.batch_sizes
+    ]
+    report("batching", results, args.output, model=args.model, requests=args.requests,
+           concurrency=args.concurrency, synthetic_models=args.synthetic_models)
+
+
+if __name__ == "__main__":
+    main()
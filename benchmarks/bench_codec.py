@@ -0,0 +1,67 @@
+"""
+Image codec benchmark: the decode / encode work every request and stream pays.
+
+Covers multipart uploads (decode_image_bytes), webcam base64 payloads
+(decode_base64_image), user thumbnails, and the RTSP preview JPEG encode,
+at several frame resolutions.
+
+    python -m benchmarks.bench_codec --resolutions 640x480 1280x720 1920x1080
+"""
+import argparse
+import base64
+import cv2
+import numpy as np
+from benchmarks._harness import measure, report
+from services import face_service
+from services.broadcast import FrameBroadcaster
+
+
+def synthetic_frame(width: int, height: int, seed: int = 0):
+    # Smooth gradients + noise compress like camera footage; pure noise would not
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.stack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                      np.broadcast_to((x + y) / 2, (height, width))], axis=2)
+    frame += rng.normal(scale=12, size=frame.shape)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def run_resolution(width: int, height: int, iterations: int, quality: int, preview_width: int):
+    frame = synthetic_frame(width, height)
+    jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+    data_url = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()
+    preview = FrameBroadcaster(width=preview_width, quality=quality)
+    params = {"resolution": f"{width}x{height}", "jpeg_kb": round(len(jpeg) / 1024, 1)}
+
+    return [
+        measure("decode_image_bytes", lambda: face_service.decode_image_bytes(jpeg), iterations, **params),
+        measure("decode_base64_image", lambda: face_service.decode_base64_image(data_url), iterations,
+                base64_kb=round(len(data_url) / 1024, 1), **params),
+        measure("base64.b64decode", lambda: base64.b64decode(data_url.split(",", 1)[1]), iterations, **params),
+        measure("imencode_jpeg", lambda: cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality]),
+                iterations, quality=quality, **params),
+        measure("make_thumbnail", lambda: face_service.make_thumbnail(frame), iterations, **params),
+        measure("preview_encode", lambda: preview._encode(frame), iterations,
+                preview_width=preview_width, quality=quality, **params),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", nargs="+", default=["640x480", "1280x720", "1920x1080"])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--quality", type=int, default=face_service.DEFAULT_PREVIEW_QUALITY)
+    parser.add_argument("--preview-width", type=int, default=face_service.DEFAULT_PREVIEW_WIDTH)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    results = []
+    for resolution in args.resolutions:
+        width, height = (int(v) for v in resolution.lower().split("x"))
+        results.extend(run_resolution(width, height, args.iterations, args.quality, args.preview_width))
+    report("codec", results, args.output, iterations=args.iterations, quality=args.quality)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+End-to-end RTSP pipeline benchmark using a local video file as the stream.
+
+Runs the real _capture_stream / _process_stream threads against a video file
+(OpenCV opens files and RTSP URLs the same way) and reports per-frame
+processing latency, analyses per second, dropped frames and peak memory.
+Match logging is counted instead of written, so no database is needed.
+
+    python -m benchmarks.bench_stream --video people.mp4 --duration 30 --target-aps 10
+    python -m benchmarks.bench_stream --synthetic-models   # generated video, no DeepFace weights
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import cv2
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from benchmarks._harness import latency_summary, peak_rss_mb, report, use_synthetic_models
+from benchmarks.bench_codec import synthetic_frame
+from benchmarks.bench_verify import load_synthetic_gallery
+from services import face_service
+
+
+def write_synthetic_video(path: str, seconds: int = 60, fps: int = 25, width: int = 1280, height: int = 720):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    background = synthetic_frame(width, height)
+    for i in range(seconds * fps):
+        frame = background.copy()
+        x = (i * 7) % (width - 200)
+        cv2.rectangle(frame, (x, 200), (x + 160, 400), (200, 180, 160), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def instrument(latencies: list, counters: dict):
+    handle = face_service._handle_stream_frame
+
+    def timed_handle(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return handle(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    def log_match(*args, **kwargs):
+        counters["logged"] += 1
+        return counters["logged"]
+
+    def update_last_seen(*args, **kwargs):
+        counters["closed"] += 1
+
+    face_service._handle_stream_frame = timed_handle
+    face_service.log_match = log_match
+    face_service.update_match_log_last_seen = update_last_seen
+    # The stream only needs a session to hand to the (already loaded) gallery
+    face_service.SessionLocal = sessionmaker(bind=create_engine("sqlite://"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="local video file (defaults to a generated 60 s clip)")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run the stream")
+    parser.add_argument("--target-aps", type=float, default=face_service.DEFAULT_TARGET_APS)
+    parser.add_argument("--gallery-size", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=512, help="embedding size for --synthetic-models")
+    parser.add_argument("--synthetic-models", action="store_true",
+                        help="replace DeepFace stages with deterministic stand-ins")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    if args.synthetic_models:
+        use_synthetic_models(face_service, dim=args.dim)
+    video = args.video or write_synthetic_video(os.path.join(tempfile.mkdtemp(prefix="frs-bench-"), "stream.avi"))
+    if not cv2.VideoCapture(video).isOpened():
+        parser.error(f"could not open {video}")
+
+    probe = face_service.detect_faces(np.zeros((480, 640, 3), dtype=np.uint8))
+    dim = len(face_service.represent_faces([probe[0]["face"]])[0])
+    load_synthetic_gallery(args.gallery_size, dim)
+
+    latencies = []
+    counters = {"logged": 0, "closed": 0}
+    instrument(latencies, counters)
+
+    # Measure the in-process pipeline even when FRS_STREAM_WORKERS is set
+    face_service.stream_pool.workers = 0
+    rss_before = peak_rss_mb()
+    face_service.start_rtsp_stream(video, "verify", target_aps=args.target_aps)
+    state = face_service.active_rtsp_streams[video]
+    time.sleep(args.duration)
+    stats = dict(state["stats"])
+    face_service.stop_rtsp_stream(video)
+    state["thread"].join(timeout=15)
+
+    processed = stats["processed"]
+    results = [{
+        "case": "_process_stream",
+        "gallery_size": args.gallery_size,
+        "target_aps": args.target_aps,
+        "duration_s": args.duration,
+        **latency_summary(latencies),
+        "throughput_per_s": round(processed / args.duration, 2),
+        "frames_captured": stats["captured"],
+        "capture_fps": stats["capture_fps"],
+        "frames_processed": processed,
+        "frames_dropped": stats["dropped"],
+        "identifications": stats["identifications"],
+        "track_reuses": stats["track_reuses"],
+        "gate_rejections": {key[5:]: value for key, value in stats.items() if key.startswith("gate_")},
+        "last_lag_ms": stats["lag_ms"],
+        "match_logs": counters["logged"],
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+        "threads_alive": threading.active_count()
+    }]
+    report("stream", results, args.output, video=video, model=face_service.GLOBAL_CONFIG["model_name"],
+           synthetic_models=args.synthetic_models)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+1:N verification benchmark: verify_face_by_path against synthetic galleries.
+
+Fills the resident gallery with N random embeddings (no database) and times
+full verify_face_by_path calls plus the gallery search on its own, for the
+exact scan and the IVF index.
+
+    python -m benchmarks.bench_verify --image face.jpg --sizes 1000 10000 100000
+    python -m benchmarks.bench_verify --synthetic-models   # no DeepFace weights needed
+"""
+import argparse
+import itertools
+import tempfile
+import time
+import cv2
+import numpy as np
+from benchmarks._harness import measure, report, use_synthetic_models
+from services import face_service
+from services.embedding_cache import embedding_cache
+from services.gallery import gallery, INDEX_CONFIG
+
+
+def load_synthetic_gallery(size: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(size, dim)).astype(np.float32)
+    gallery.load_vectors(list(range(1, size + 1)), [f"user_{i}" for i in range(1, size + 1)],
+                         vectors, face_service.GLOBAL_CONFIG["model_name"])
+    return vectors
+
+
+def probe_dim(img) -> int:
+    faces = face_service.detect_faces(img)
+    return len(face_service.represent_faces([faces[0]["face"]])[0])
+
+
+def run_size(img, size: int, dim: int, engines: list, iterations: int, nlist: int, nprobe: int):
+    results = []
+    for engine in engines:
+        INDEX_CONFIG["engine"] = "exact"
+        start = time.perf_counter()
+        vectors = load_synthetic_gallery(size, dim)
+        load_s = time.perf_counter() - start
+
+        build_s = None
+        if engine == "ivf":
+            INDEX_CONFIG.update(engine="ivf", min_size=0, nprobe=nprobe)
+            start = time.perf_counter()
+            gallery.build_index(nlist=min(nlist, size))
+            build_s = round(time.perf_counter() - start, 3)
+
+        params = {"gallery_size": size, "engine": engine, "dim": dim,
+                  "load_s": round(load_s, 3), "index_build_s": build_s}
+        # The same probe every iteration: time the models with the cache off, then a cache hit
+        cache_mode, embedding_cache.mode = embedding_cache.mode, "off"
+        results.append(measure("verify_face_by_path", lambda: face_service.verify_face_by_path(None, img),
+                               iterations, **params))
+        embedding_cache.mode = "exact"
+        results.append(measure("verify_face_by_path[cached]", lambda: face_service.verify_face_by_path(None, img),
+                               iterations, **params))
+        embedding_cache.mode = cache_mode
+
+        probes = vectors[:64] + np.random.default_rng(1).normal(scale=0.05, size=(64, dim)).astype(np.float32)
+        i = itertools.count()
+        results.append(measure("gallery.search", lambda: gallery.search(probes[next(i) % 64]),
+                               iterations * 10, **params))
+        results.append(measure("gallery.search_many[8]", lambda: gallery.search_many(probes[:8]),
+                               iterations, **params))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="probe image (defaults to a synthetic frame)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--engines", nargs="+", default=["exact", "ivf"], choices=["exact", "ivf"])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--synthetic-models", action="store_true",
+                        help="replace DeepFace stages with deterministic stand-ins (isolates matching cost)")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    if args.synthetic_models:
+        use_synthetic_models(face_service)
+    # Never overwrite the service's persisted IVF index
+    INDEX_CONFIG["path"] = f"{tempfile.mkdtemp(prefix='frs-bench-')}/ann_index.npz"
+
+    if args.image:
+        img = cv2.imread(args.image)
+        if img is None:
+            parser.error(f"could not read {args.image}")
+    else:
+        img = np.random.default_rng(0).integers(0, 255, size=(480, 640, 3), dtype=np.uint8)
+
+    dim = probe_dim(img)
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(img, size, dim, args.engines, args.iterations, args.nlist, args.nprobe))
+    report("verify", results, args.output, model=face_service.GLOBAL_CONFIG["model_name"],
+           synthetic_models=args.synthetic_models, image=args.image, iterations=args.iterations)
+
+
+if __name__ == "__main__":
+    main()
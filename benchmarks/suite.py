@@ -0,0 +1,61 @@
+"""
+Runs every benchmark in its own process and merges the reports into one JSON
+document, so a run can be diffed against an earlier one.
+
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --synthetic-models --quick
+"""
+import argparse
+import json
+import subprocess
+import sys
+from benchmarks._harness import environment
+
+BENCHMARKS = {
+    "codec": "benchmarks.bench_codec",
+    "verify": "benchmarks.bench_verify",
+    "stream": "benchmarks.bench_stream",
+    "batching": "benchmarks.bench_batching",
+}
+QUICK_ARGS = {
+    "codec": ["--iterations", "20"],
+    "verify": ["--iterations", "10", "--sizes", "1000", "10000"],
+    "stream": ["--duration", "5"],
+    "batching": ["--requests", "64", "--concurrency", "16"],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--synthetic-models", action="store_true")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations and smaller galleries")
+    parser.add_argument("--output", help="write the merged JSON report here")
+    args = parser.parse_args()
+
+    reports = {}
+    for name in args.only:
+        # A fresh process per benchmark keeps peak RSS figures independent
+        cmd = [sys.executable, "-m", BENCHMARKS[name]]
+        if args.synthetic_models and name != "codec":
+            cmd.append("--synthetic-models")
+        if args.quick:
+            cmd.extend(QUICK_ARGS[name])
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            reports[name] = {"error": proc.stderr.strip().splitlines()[-1:] or ["failed"]}
+            continue
+        # Library warnings may precede the report on stdout
+        out = proc.stdout
+        reports[name] = json.loads(out[out.index('{\n  "benchmark"'):])
+
+    merged = {"environment": environment(), "benchmarks": reports}
+    text = json.dumps(merged, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
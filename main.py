@@ -1,16 +1,31 @@
-from fastapi import FastAPI, Request, File, UploadFile, Depends, Form, HTTPException, Response
+import asyncio
+from fastapi import FastAPI, Request, File, UploadFile, Depends, Form, HTTPException, Response, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, PlainTextResponse
+from starlette.websockets import WebSocketState
 from sqlalchemy.orm import Session
 import models
 import schemas
 import database
-from services import face_service
+import migrations
+from services import face_service, bulk_import, reembed, metrics
+from services.executor import inference_executor, ExecutorBusy
+from services.stream_pool import stream_pool
 
 # Initialize Database
 models.Base.metadata.create_all(bind=database.engine)
+migrations.migrate_embeddings_to_binary(database.engine)
+migrations.add_missing_columns(database.engine)
+migrations.create_missing_indexes(database.engine)
+# Before anything reads the gallery: a model switch outlives the process
+face_service.set_active_model(migrations.restore_active_model(database.engine, face_service.GLOBAL_CONFIG["model_name"]))
+migrations.tag_legacy_embeddings(database.engine, face_service.GLOBAL_CONFIG["model_name"])
+migrations.sync_auto_name_sequence(database.engine)
 from passlib.context import CryptContext
 
 app = FastAPI(title="Facial Recognition System")
@@ -20,6 +35,52 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Templates
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["image_version"] = face_service.image_version
+
+@app.on_event("startup")
+def preload_models():
+    # Build and warm the configured models before the first request arrives
+    face_service.preload_models()
+
+@app.on_event("startup")
+def start_stream_workers():
+    # FRS_STREAM_WORKERS > 0 runs RTSP streams in that many worker processes
+    if stream_pool.enabled:
+        stream_pool.start(face_service.GLOBAL_CONFIG)
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    inference_executor.shutdown()
+    stream_pool.stop()
+    # Flush any match logs still waiting in the bulk writer
+    face_service.match_log_writer.stop()
+
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request: Request, exc: ExecutorBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    trace, token = metrics.start_trace()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/users/{user_id}/image), never the raw path
+        route = request.scope.get("route")
+        trace.endpoint = getattr(route, "path", None) or "unmatched"
+        elapsed = metrics.finish_trace(trace, token, method=request.method)
+        metrics.request_seconds.observe(elapsed, endpoint=trace.endpoint, method=request.method, status=status)
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 # Dependency
 def get_db():
@@ -45,9 +106,11 @@ async def post_register(
     db: Session = Depends(get_db)
 ):
     try:
-        user = face_service.create_user(db, name, file)
+        user = await inference_executor.run(face_service.create_user, db, name, file)
         message = f"Successfully registered {user.name}!"
         return templates.TemplateResponse("register.html", {"request": request, "message": message, "message_type": "success"})
+    except ExecutorBusy:
+        raise
     except Exception as e:
         return templates.TemplateResponse("register.html", {"request": request, "message": str(e), "message_type": "error"})
 
@@ -62,42 +125,131 @@ async def post_verify(
     db: Session = Depends(get_db)
 ):
     try:
-        result = face_service.verify_user(db, file)
+        # The result page shows identity only, so attributes are not analyzed at all
+        result = await inference_executor.run(face_service.verify_user, db, file, None, "off")
         return templates.TemplateResponse("result.html", {"request": request, "result": result})
+    except ExecutorBusy:
+        raise
     except Exception as e:
         return templates.TemplateResponse("verify.html", {"request": request, "message": str(e), "message_type": "error"})
 
+USERS_PAGE_SIZE = 50
+
 @app.get("/users", response_class=HTMLResponse)
-async def get_users(request: Request, db: Session = Depends(get_db)):
-    users = face_service.get_all_users(db)
-    return templates.TemplateResponse("users.html", {"request": request, "users": users})
+def get_users(request: Request, q: Optional[str] = None, page: int = 1, db: Session = Depends(get_db)):
+    page = max(page, 1)
+    users, total = face_service.get_all_users(db, search=q, limit=USERS_PAGE_SIZE, offset=(page - 1) * USERS_PAGE_SIZE)
+    return templates.TemplateResponse("users.html", {
+        "request": request,
+        "users": users,
+        "total": total,
+        "q": q or "",
+        "page": page,
+        "pages": max(1, -(-total // USERS_PAGE_SIZE))
+    })
 
 @app.get("/users/{user_id}/image")
-async def get_user_image(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
+def get_user_image(request: Request, user_id: int, size: str = "full", v: Optional[str] = None,
+                   db: Session = Depends(get_db)):
+    thumbnail = size == "thumb"
+    meta = face_service.get_user_image_meta(db, user_id)
+    if not meta:
         raise HTTPException(status_code=404, detail="User not found")
-    if user.image_data:
-        return Response(content=user.image_data, media_type="image/jpeg")
-    
-    # Fallback for old records without image_data
-    import os
-    if os.path.exists(user.image_path):
-        with open(user.image_path, "rb") as f:
-            return Response(content=f.read(), media_type="image/jpeg")
-            
-    raise HTTPException(status_code=404, detail="Image data not available")
+
+    # Validators come from the row metadata, so a 304 never touches the image blob
+    modified = meta.updated_at or meta.created_at
+    version = face_service.image_version(modified)
+    etag = f'"user-{user_id}-{version}-{"thumb" if thumbnail else "full"}"'
+    headers = {
+        "ETag": etag,
+        # Versioned URLs (?v=) change whenever the image does, so they can be cached for long
+        "Cache-Control": "private, max-age=31536000, immutable" if v else "private, no-cache"
+    }
+    if modified:
+        headers["Last-Modified"] = format_datetime(modified.astimezone(timezone.utc), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match:
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif if_modified_since and modified:
+        try:
+            if modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    image_data = face_service.get_user_image(db, user_id, thumbnail=thumbnail)
+    if not image_data:
+        raise HTTPException(status_code=404, detail="Image data not available")
+    return Response(content=image_data, media_type="image/jpeg", headers=headers)
 
 @app.delete("/users/{user_id}")
-async def delete_user(user_id: int, db: Session = Depends(get_db)):
+def delete_user(user_id: int, db: Session = Depends(get_db)):
     try:
         face_service.delete_user(db, user_id)
         return {"status": "success", "message": "User deleted successfully."}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+class BulkDirectoryImport(BaseModel):
+    directory: str # relative to FRS_IMPORT_ROOT
+    manifest: Optional[str] = None # CSV (filename,name) or JSON, relative to FRS_IMPORT_ROOT
+    workers: int = 4
+    batch_size: int = 100
+
+@app.post("/users/bulk/zip")
+async def bulk_import_zip(file: UploadFile = File(...), workers: int = Form(4), batch_size: int = Form(100)):
+    """ZIP of images, optionally with a manifest.csv / manifest.json at its root."""
+    try:
+        return bulk_import.start_zip_import(await file.read(), workers, batch_size)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/users/bulk/directory")
+def bulk_import_directory(data: BulkDirectoryImport):
+    try:
+        return bulk_import.start_directory_import(data.directory, data.manifest, data.workers, data.batch_size)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/users/bulk")
+def list_bulk_imports():
+    return bulk_import.list_imports()
+
+@app.get("/users/bulk/{job_id}")
+def get_bulk_import(job_id: str):
+    try:
+        return bulk_import.get_import(job_id).progress()
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/users/bulk/{job_id}/resume")
+def resume_bulk_import(job_id: str):
+    try:
+        return bulk_import.resume_import(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/users/bulk/{job_id}/cancel")
+def cancel_bulk_import(job_id: str):
+    try:
+        return bulk_import.cancel_import(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def check_attribute_options(mode: str, tasks: Optional[list[str]]):
+    if mode not in face_service.ATTRIBUTE_MODES:
+        raise HTTPException(status_code=400, detail=f"attributes must be one of {', '.join(face_service.ATTRIBUTE_MODES)}.")
+    unknown = set(tasks or []) - set(face_service.ATTRIBUTE_TASKS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown attribute tasks: {', '.join(sorted(unknown))}.")
+
 class WebcamImage(BaseModel):
     image: str
+    attributes: str = "async" # "off", "sync" (wait for them) or "async" (poll attributes_job)
+    tasks: Optional[list[str]] = None # default: the configured tasks
 
 class WebcamRegister(BaseModel):
     name: str
@@ -109,29 +261,153 @@ async def get_webcam(request: Request):
 
 @app.post("/webcam/verify")
 async def verify_webcam(data: WebcamImage, db: Session = Depends(get_db)):
+    check_attribute_options(data.attributes, data.tasks)
     try:
-        result = face_service.verify_user_base64(db, data.image)
+        result = await inference_executor.run(face_service.verify_user_base64, db, data.image,
+                                              data.tasks, data.attributes)
         return result
+    except ExecutorBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.websocket("/webcam/ws")
+async def webcam_ws(websocket: WebSocket, db: Session = Depends(get_db)):
+    """
+    Live verification on one persistent connection: the client sends binary
+    JPEG frames and gets one JSON result per analyzed frame, in the same shape
+    as POST /webcam/verify. Frames sent faster than inference keeps up with
+    are dropped server-side, newest wins.
+
+    ?attributes=off|sync|async (default async) and ?tasks=age,gender,...
+    choose attribute analysis; async results arrive later as separate
+    {"type": "attributes", "track_id", ...} messages.
+    """
+    attribute_mode = websocket.query_params.get("attributes", "async")
+    tasks = websocket.query_params.get("tasks")
+    tasks = [task for task in tasks.split(",") if task] if tasks is not None else None
+    try:
+        check_attribute_options(attribute_mode, tasks)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    send_lock = asyncio.Lock()
+
+    async def send(message: dict) -> bool:
+        """False once the client is gone (a disconnect during inference surfaces here as RuntimeError)."""
+        async with send_lock:
+            if websocket.client_state != WebSocketState.CONNECTED:
+                return False
+            try:
+                await websocket.send_json(message)
+                return True
+            except (WebSocketDisconnect, RuntimeError):
+                return False
+
+    def on_attributes(track_id: int, attributes: dict):
+        # Called from the attribute queue's thread
+        asyncio.run_coroutine_threadsafe(send({"type": "attributes", "track_id": track_id, **attributes}), loop)
+
+    session = face_service.WebcamSession(attribute_mode=attribute_mode, tasks=tasks, on_attributes=on_attributes)
+    frame_ready = asyncio.Event()
+    closed = asyncio.Event()
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    session.offer(message["bytes"])
+                    frame_ready.set()
+        finally:
+            closed.set()
+            frame_ready.set()
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if closed.is_set():
+                break
+            frame = session.take()
+            if frame is None:
+                continue
+            trace, token = metrics.start_trace(endpoint="/webcam/ws")
+            status = "ok"
+            try:
+                result = await inference_executor.run(face_service.verify_webcam_frame, db, session, frame)
+            except ExecutorBusy as e:
+                status = "busy"
+                result = {"status": "busy", "message": str(e), "retry_after": e.retry_after}
+            except HTTPException as e:
+                status = "error"
+                result = {"status": "error", "message": e.detail}
+            except Exception as e:
+                status = "error"
+                result = {"status": "error", "message": str(e)}
+            finally:
+                elapsed = metrics.finish_trace(trace, token, method="WS")
+                metrics.request_seconds.observe(elapsed, endpoint="/webcam/ws", method="WS", status=status)
+            if not await send(result):
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Attribute analyses still running must not push to the closed socket
+        session.on_attributes = None
+        receiver.cancel()
+
+@app.get("/attributes/{job_id}")
+def get_attributes(job_id: str):
+    """Result of a background attribute analysis (attributes_job of a verify response)."""
+    return face_service.get_attribute_result(job_id)
+
 @app.post("/webcam/register")
 async def register_webcam(data: WebcamRegister, db: Session = Depends(get_db)):
     try:
-        user = face_service.create_user_base64(db, data.name, data.image)
+        user = await inference_executor.run(face_service.create_user_base64, db, data.name, data.image)
         return {"status": "success", "message": f"Successfully registered {user.name}!"}
+    except ExecutorBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 class RTSPStart(BaseModel):
     url: str
     mode: str # "register" or "verify"
+    target_aps: float = face_service.DEFAULT_TARGET_APS # analyses per second
+    preview_width: int = face_service.DEFAULT_PREVIEW_WIDTH
+    preview_quality: int = face_service.DEFAULT_PREVIEW_QUALITY
+    snapshots: bool = False
+    attributes: str = "off" # "off", "sync" or "async" (attached to the match log row later)
+    tasks: Optional[list[str]] = None # default: the configured tasks
 
 @app.post("/rtsp/start")
 async def start_rtsp(data: RTSPStart):
     if data.mode not in ["register", "verify"]:
         raise HTTPException(status_code=400, detail="Invalid mode.")
-    return face_service.start_rtsp_stream(data.url, data.mode)
+    if data.target_aps <= 0:
+        raise HTTPException(status_code=400, detail="target_aps must be positive.")
+    if not 1 <= data.preview_quality <= 100:
+        raise HTTPException(status_code=400, detail="preview_quality must be between 1 and 100.")
+    check_attribute_options(data.attributes, data.tasks)
+    return face_service.start_rtsp_stream(data.url, data.mode, data.target_aps,
+                                          data.preview_width, data.preview_quality, data.snapshots,
+                                          data.attributes, data.tasks)
+
+@app.get("/rtsp/status")
+async def rtsp_status():
+    return face_service.get_rtsp_status()
+
+@app.get("/rtsp/unknown")
+async def rtsp_unknown_faces():
+    return face_service.get_unknown_faces_status()
 
 @app.post("/rtsp/stop")
 async def stop_rtsp(data: RTSPStart):
@@ -152,9 +428,46 @@ async def rtsp_feed(url: str):
     )
 
 @app.get("/logs/matches")
-async def get_logs(db: Session = Depends(get_db)):
-    logs = face_service.get_match_logs(db)
-    return logs
+def get_logs(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    user_id: Optional[int] = None,
+    source: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    unknown_only: bool = False,
+    db: Session = Depends(get_db)
+):
+    try:
+        return face_service.get_match_logs(
+            db, limit=max(1, min(limit, 500)), cursor=cursor, user_id=user_id, source=source,
+            since=since, until=until, min_score=min_score, max_score=max_score, unknown_only=unknown_only
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/logs/matches/{log_id}/snapshot")
+def get_log_snapshot(log_id: int, db: Session = Depends(get_db)):
+    snapshot = face_service.get_match_log_snapshot(db, log_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Snapshot not available")
+    return Response(content=snapshot, media_type="image/jpeg")
+
+@app.get("/logs/stats/hourly")
+def get_hourly_sightings(
+    user_id: Optional[int] = None,
+    source: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    return face_service.get_sightings_per_hour(db, user_id=user_id, source=source, since=since, until=until)
+
+@app.get("/logs/writer")
+async def get_log_writer():
+    return face_service.get_log_writer_status()
 
 class AppConfig(BaseModel):
     model_name: str
@@ -166,9 +479,57 @@ async def get_config():
 
 @app.put("/config")
 async def update_config(data: AppConfig):
-    face_service.GLOBAL_CONFIG["model_name"] = data.model_name
-    face_service.GLOBAL_CONFIG["tasks"] = data.tasks
-    return {"status": "success", "message": "Configuration updated successfully!"}
+    try:
+        return face_service.update_config(data.model_name, data.tasks)
+    except Exception as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/models")
+async def get_models():
+    return face_service.get_model_status()
+
+@app.get("/models/reembed")
+async def get_reembedding():
+    return reembed.get_reembedding_status()
+
+@app.post("/models/reembed/cancel")
+async def cancel_reembedding():
+    try:
+        return reembed.cancel_reembedding()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/models/reembed/resume")
+async def resume_reembedding():
+    try:
+        return reembed.resume_reembedding()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/executor")
+async def get_executor():
+    return inference_executor.stats()
+
+class IndexConfig(BaseModel):
+    engine: str # "exact" or "ivf"
+    nlist: Optional[int] = None
+    nprobe: Optional[int] = None
+    min_size: Optional[int] = None
+
+@app.get("/index")
+def get_index(db: Session = Depends(get_db)):
+    return face_service.get_index_status(db)
+
+@app.put("/index")
+def update_index(data: IndexConfig, db: Session = Depends(get_db)):
+    try:
+        return face_service.configure_index(db, data.engine, data.nlist, data.nprobe, data.min_size)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/index/recall")
+def get_index_recall(samples: int = 200, k: int = 1, db: Session = Depends(get_db)):
+    return face_service.check_index_recall(db, samples, k)
 
 class UserUpdate(BaseModel):
     name: str
@@ -177,8 +538,10 @@ class UserUpdate(BaseModel):
 @app.put("/users/{user_id}")
 async def update_user(user_id: int, data: UserUpdate, db: Session = Depends(get_db)):
     try:
-        user = face_service.update_user(db, user_id, data.name, data.image)
+        user = await inference_executor.run(face_service.update_user, db, user_id, data.name, data.image)
         return {"status": "success", "message": f"Successfully updated user {user.name}."}
+    except ExecutorBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -0,0 +1,134 @@
+import json
+import numpy as np
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+def migrate_embeddings_to_binary(engine: Engine, batch_size: int = 1000):
+    """
+    One-off upgrade of users.embedding from JSON/JSONB text to packed float32 BYTEA.
+    Safe to call on every startup: it does nothing once the column is binary.
+    """
+    inspector = inspect(engine)
+    if "users" not in inspector.get_table_names():
+        return
+
+    columns = {c["name"]: c for c in inspector.get_columns("users")}
+    embedding_col = columns.get("embedding")
+    if embedding_col is None or "JSON" not in str(embedding_col["type"]).upper():
+        return
+
+    print("Migrating users.embedding from JSON to float32 BYTEA...")
+    migrated = 0
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE users ADD COLUMN embedding_f32 BYTEA"))
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                text("SELECT id, embedding::text FROM users WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": batch_size}
+            ).fetchall()
+            if not rows:
+                break
+            params = [
+                {"id": row_id, "data": np.asarray(json.loads(raw) if raw else [], dtype="<f4").tobytes()}
+                for row_id, raw in rows
+            ]
+            conn.execute(text("UPDATE users SET embedding_f32 = :data WHERE id = :id"), params)
+            migrated += len(rows)
+            last_id = rows[-1][0]
+
+        conn.execute(text("ALTER TABLE users DROP COLUMN embedding"))
+        conn.execute(text("ALTER TABLE users RENAME COLUMN embedding_f32 TO embedding"))
+        conn.execute(text("ALTER TABLE users ALTER COLUMN embedding SET NOT NULL"))
+    print(f"Migrated {migrated} embeddings to binary storage.")
+
+# Columns added to existing tables after their first release: { table: { column: DDL type } }
+ADDED_COLUMNS = {
+    "users": {
+        "thumbnail": "BYTEA",
+        "updated_at": "TIMESTAMP WITH TIME ZONE DEFAULT now()",
+        "embedding_model": "VARCHAR",
+        "embedding_dim": "INTEGER"
+    },
+    "match_logs": {
+        "track_id": "INTEGER",
+        "last_seen": "TIMESTAMP WITH TIME ZONE",
+        "attributes": "JSON"
+    }
+}
+
+def add_missing_columns(engine: Engine):
+    """create_all() never alters existing tables, so add new nullable columns here."""
+    inspector = inspect(engine)
+    tables = inspector.get_table_names()
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            if table not in tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            for column, ddl_type in columns.items():
+                if column not in existing:
+                    print(f"Adding column {table}.{column}")
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+def create_missing_indexes(engine: Engine):
+    """Indexes declared on models after their table already existed."""
+    import models
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def restore_active_model(engine: Engine, default: str) -> str:
+    """
+    The recognition model users.embedding belongs to. A model switch records it
+    in app_settings; databases switched before that was recorded fall back to
+    the model most users are tagged with, and fresh ones to `default`.
+    """
+    with engine.begin() as conn:
+        model_name = conn.execute(text("SELECT value FROM app_settings WHERE key = 'model_name'")).scalar()
+        if model_name is None:
+            model_name = conn.execute(text(
+                "SELECT embedding_model FROM users WHERE embedding_model IS NOT NULL "
+                "GROUP BY embedding_model ORDER BY count(*) DESC LIMIT 1"
+            )).scalar() or default
+            save_active_model(conn, model_name)
+    if model_name != default:
+        print(f"Restored active model {model_name}.")
+    return model_name
+
+def save_active_model(conn, model_name: str):
+    """Record the active model; call it in the transaction that promotes its embeddings."""
+    conn.execute(
+        text("INSERT INTO app_settings (key, value) VALUES ('model_name', :model) "
+             "ON CONFLICT (key) DO UPDATE SET value = excluded.value"),
+        {"model": model_name}
+    )
+
+def tag_legacy_embeddings(engine: Engine, model_name: str):
+    """
+    Rows enrolled before embeddings were tagged were produced by the configured
+    model: tag them with it and mirror them into user_embeddings.
+    """
+    with engine.begin() as conn:
+        tagged = conn.execute(
+            text("UPDATE users SET embedding_model = :model, embedding_dim = length(embedding) / 4 "
+                 "WHERE embedding_model IS NULL"),
+            {"model": model_name}
+        ).rowcount
+        mirrored = conn.execute(text(
+            "INSERT INTO user_embeddings (user_id, model_name, dim, embedding) "
+            "SELECT u.id, u.embedding_model, u.embedding_dim, u.embedding FROM users u "
+            "WHERE NOT EXISTS (SELECT 1 FROM user_embeddings e "
+            "WHERE e.user_id = u.id AND e.model_name = u.embedding_model)"
+        )).rowcount
+    if tagged or mirrored:
+        print(f"Tagged {tagged} legacy embeddings with {model_name}, mirrored {mirrored} into user_embeddings.")
+
+def sync_auto_name_sequence(engine: Engine):
+    """Start the auto-registration sequence after any numeric names already in use."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "SELECT setval('auto_user_name_seq', m, true) "
+            "FROM (SELECT MAX(name::bigint) AS m FROM users WHERE name ~ '^[0-9]{1,9}$') s "
+            "WHERE m IS NOT NULL AND m >= (SELECT last_value FROM auto_user_name_seq)"
+        ))
@@ -1,8 +1,38 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, LargeBinary, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, LargeBinary, ForeignKey, Float, Index, UniqueConstraint, Sequence, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
+import numpy as np
 from database import Base
 
+class Float32Vector(TypeDecorator):
+    """
+    Embedding stored as packed little-endian float32 bytes (BYTEA).
+    Accepts lists or numpy arrays on write and loads as a read-only
+    numpy view over the row bytes (no parsing, no copy).
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return np.asarray(value, dtype="<f4").tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype="<f4")
+
+    def compare_values(self, x, y):
+        # Default == compares arrays elementwise, which breaks ORM change detection
+        if x is None or y is None:
+            return x is y
+        return np.array_equal(np.asarray(x, dtype="<f4"), np.asarray(y, dtype="<f4"))
+
+# Numbering for auto-registered RTSP users ("001", "002", ...)
+auto_user_name_seq = Sequence("auto_user_name_seq", metadata=Base.metadata)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -10,11 +40,40 @@ class User(Base):
     name = Column(String, index=True)
     image_path = Column(Text, nullable=False)
     image_data = Column(LargeBinary, nullable=True) # Added for DB storage
-    # Storing embedding as a JSON array of floats
-    embedding = Column(JSON, nullable=False)
+    thumbnail = Column(LargeBinary, nullable=True) # Small JPEG for the user grid
+    # Storing embedding as packed float32 bytes (see Float32Vector)
+    embedding = Column(Float32Vector, nullable=False)
+    # Model that produced `embedding` (the active one once a switch completes); NULL for legacy rows
+    embedding_model = Column(String, nullable=True)
+    embedding_dim = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Drives image ETag / Last-Modified
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     match_logs = relationship("MatchLog", back_populates="user")
+    embeddings = relationship("UserEmbedding", back_populates="user", cascade="all, delete-orphan")
+
+class UserEmbedding(Base):
+    """
+    One embedding per (user, recognition model). users.embedding mirrors the
+    row for the active model; rows for other models are filled in by the
+    re-embedding job ahead of a model switch.
+    """
+    __tablename__ = "user_embeddings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    model_name = Column(String, nullable=False)
+    dim = Column(Integer, nullable=False)
+    embedding = Column(Float32Vector, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    user = relationship("User", back_populates="embeddings")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "model_name", name="uq_user_embeddings_user_model"),
+        Index("ix_user_embeddings_model_user", "model_name", "user_id"),
+    )
 
 class MatchLog(Base):
     __tablename__ = "match_logs"
@@ -25,5 +84,25 @@ class MatchLog(Base):
     confidence_score = Column(Float, nullable=True)
     source = Column(String, index=True) # e.g. "Webcam", "RTSP - Camera 1"
     image_snapshot = Column(LargeBinary, nullable=True) # snapshot of the match
+    track_id = Column(Integer, nullable=True) # RTSP face track this sighting belongs to
+    last_seen = Column(DateTime(timezone=True), nullable=True) # end of the track appearance
+    attributes = Column(JSON(none_as_null=True), nullable=True) # age/gender/race/emotion, possibly filled in after the row
 
     user = relationship("User", back_populates="match_logs")
+
+    # Keyset pagination walks (timestamp, id) newest-first, optionally per user or source
+    __table_args__ = (
+        Index("ix_match_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_match_logs_user_timestamp", "user_id", "timestamp"),
+        Index("ix_match_logs_source_timestamp", "source", "timestamp"),
+    )
+
+class AppSetting(Base):
+    """
+    Runtime state that has to survive a restart, e.g. the active recognition
+    model ("model_name") after a switch re-embedded the gallery.
+    """
+    __tablename__ = "app_settings"
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=True)
@@ -0,0 +1,132 @@
+import os
+import threading
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over L2-normalized embeddings (pure NumPy).
+
+    A spherical k-means coarse quantizer splits the gallery into `nlist` cells;
+    a query only scans the users in its `nprobe` closest cells. Raising nprobe
+    trades latency for recall (nprobe == nlist is an exhaustive scan).
+    The index only proposes candidate ids - exact distances are re-computed
+    by the caller so match thresholds stay meaningful.
+    """
+
+    def __init__(self, nlist: int = 256, nprobe: int = 8):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids = None  # (nlist, dim) float32, unit norm
+        self._lists = []       # list_no -> set of user ids
+        self._assignment = {}  # user_id -> list_no
+        self._lock = threading.RLock()
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def __len__(self):
+        return len(self._assignment)
+
+    def train(self, vectors: np.ndarray, n_iter: int = 20, max_points_per_list: int = 64, seed: int = 0):
+        """Fit the coarse quantizer with spherical k-means on (a sample of) the gallery."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        nlist = max(1, min(self.nlist, len(vectors)))
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(len(vectors), nlist * max_points_per_list)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty cells from random points so every list stays useful
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        with self._lock:
+            self.nlist = nlist
+            self.nprobe = min(self.nprobe, nlist)
+            self.centroids = centroids.astype(np.float32)
+            self._lists = [set() for _ in range(nlist)]
+            self._assignment = {}
+
+    def _nearest_lists(self, vectors: np.ndarray, n: int):
+        scores = vectors @ self.centroids.T
+        if n >= self.nlist:
+            return np.argsort(-scores, axis=1)
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+    def add(self, user_id: int, vector: np.ndarray):
+        self.add_many([user_id], np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+    def add_many(self, user_ids, vectors: np.ndarray):
+        if not self.is_trained or len(user_ids) == 0:
+            return
+        lists = self._nearest_lists(np.asarray(vectors, dtype=np.float32), 1)[:, 0]
+        with self._lock:
+            for user_id, list_no in zip(user_ids, lists):
+                user_id, list_no = int(user_id), int(list_no)
+                previous = self._assignment.get(user_id)
+                if previous is not None:
+                    self._lists[previous].discard(user_id)
+                self._lists[list_no].add(user_id)
+                self._assignment[user_id] = list_no
+
+    def remove(self, user_id: int):
+        with self._lock:
+            list_no = self._assignment.pop(user_id, None)
+            if list_no is not None:
+                self._lists[list_no].discard(user_id)
+
+    def candidates(self, query: np.ndarray, nprobe: int = None):
+        """User ids living in the nprobe cells closest to the (normalized) query."""
+        if not self.is_trained:
+            return []
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        probe_lists = self._nearest_lists(query.reshape(1, -1), nprobe)[0]
+        with self._lock:
+            ids = []
+            for list_no in probe_lists:
+                ids.extend(self._lists[list_no])
+        return ids
+
+    def stats(self):
+        sizes = [len(l) for l in self._lists] if self.is_trained else []
+        return {
+            "engine": "ivf",
+            "trained": self.is_trained,
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "size": len(self),
+            "max_list_size": max(sizes) if sizes else 0,
+            "empty_lists": sum(1 for s in sizes if s == 0),
+        }
+
+    def save(self, path: str):
+        """Persist the trained quantizer. The lists are not saved: they are cheap to rebuild from the gallery."""
+        with self._lock:
+            if not self.is_trained:
+                return
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(tmp_path, centroids=self.centroids, nprobe=np.int32(self.nprobe))
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """An empty index with the saved centroids; fill it with add_many()."""
+        with np.load(path) as data:
+            centroids = data["centroids"].astype(np.float32)
+            index = cls(nlist=len(centroids), nprobe=int(data["nprobe"]))
+        index.centroids = centroids
+        index._lists = [set() for _ in range(len(centroids))]
+        return index
@@ -0,0 +1,117 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+ATTRIBUTE_TASKS = ("age", "gender", "race", "emotion")
+ATTRIBUTE_MODES = ("off", "sync", "async") # per request / per stream: skip, answer with, or after the identity
+
+
+class AttributeQueue:
+    """
+    Background age/gender/race/emotion analysis, so identity answers never
+    wait on the attribute models. Jobs run on `workers` daemon threads; when
+    `max_queue` jobs are already waiting a new one is dropped rather than
+    letting attribute work pile up behind a busy camera.
+
+    Each job gets an id whose result can be polled (kept for `result_ttl_s`),
+    and an optional callback that attaches the result where it belongs (a
+    stream track and its match log row, a WebSocket client, a cache entry).
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 256, result_ttl_s: float = 300.0, max_results: int = 4096):
+        self.workers = workers
+        self.result_ttl_s = result_ttl_s
+        self.max_results = max_results
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._ids = itertools.count(1)
+        self._results = OrderedDict() # { job id: (finished_at or None, attributes or None) }
+        self._lock = threading.Lock()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self.metrics = {"submitted": 0, "completed": 0, "failed": 0, "dropped": 0, "total_ms": 0.0}
+
+    def _start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._loop, name=f"attributes-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, fn, callback=None):
+        """Queue fn() -> attributes; returns the job id, or None if the queue is full."""
+        self._start()
+        job_id = str(next(self._ids))
+        try:
+            self._queue.put_nowait((job_id, fn, callback))
+        except queue.Full:
+            self.metrics["dropped"] += 1
+            return None
+        with self._lock:
+            self._results[job_id] = (None, None)
+            self._prune()
+        self.metrics["submitted"] += 1
+        return job_id
+
+    def _prune(self):
+        # Oldest first; pending jobs are never pruned by age
+        now = time.monotonic()
+        while self._results:
+            job_id, (finished_at, _) = next(iter(self._results.items()))
+            expired = finished_at is not None and now - finished_at > self.result_ttl_s
+            if not expired and len(self._results) <= self.max_results:
+                break
+            del self._results[job_id]
+
+    def _loop(self):
+        while True:
+            job_id, fn, callback = self._queue.get()
+            start = time.perf_counter()
+            try:
+                attributes = fn()
+            except Exception as e:
+                print(f"AttributeQueue: job {job_id} failed: {e}")
+                self.metrics["failed"] += 1
+                attributes = None
+            else:
+                self.metrics["completed"] += 1
+                self.metrics["total_ms"] += (time.perf_counter() - start) * 1000
+            with self._lock:
+                if job_id in self._results:
+                    self._results[job_id] = (time.monotonic(), attributes)
+            if callback is not None and attributes is not None:
+                try:
+                    callback(attributes)
+                except Exception as e:
+                    print(f"AttributeQueue: callback for job {job_id} failed: {e}")
+
+    def result(self, job_id: str):
+        with self._lock:
+            entry = self._results.get(job_id)
+        if entry is None:
+            return {"status": "unknown"}
+        finished_at, attributes = entry
+        if finished_at is None:
+            return {"status": "pending"}
+        if attributes is None:
+            return {"status": "failed"}
+        return {"status": "done", "attributes": attributes}
+
+    def stats(self):
+        completed = self.metrics["completed"]
+        return {
+            **{k: v for k, v in self.metrics.items() if k != "total_ms"},
+            "queued": self._queue.qsize(),
+            "workers": self.workers,
+            "avg_ms": round(self.metrics["total_ms"] / completed, 2) if completed else 0.0
+        }
+
+
+attribute_queue = AttributeQueue(
+    workers=int(os.getenv("FRS_ATTRIBUTE_WORKERS", "1")),
+    max_queue=int(os.getenv("FRS_ATTRIBUTE_QUEUE", "256"))
+)
@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import time
+import numpy as np
+from deepface.modules import preprocessing
+from services.model_manager import model_manager
+
+
+def batch_forward(model_name: str, faces: list):
+    """
+    Embed a list of aligned BGR face crops with one forward pass.
+    Mirrors DeepFace.represent(detector_backend="skip") preprocessing as of the
+    pinned deepface release: the crop reaches the model in BGR (represent flips
+    it to RGB and back), so it is resized and normalized without a channel swap.
+    """
+    model = model_manager.get("facial_recognition", model_name)
+    target_size = model.input_shape
+    batch = np.concatenate([
+        preprocessing.normalize_input(
+            img=preprocessing.resize_image(img=face, target_size=(target_size[1], target_size[0])),
+            normalization="base"
+        )
+        for face in faces
+    ])
+
+    keras_model = getattr(model, "model", None)
+    if keras_model is not None and hasattr(keras_model, "predict_on_batch"):
+        return np.asarray(keras_model(batch, training=False)).tolist()
+
+    # Non-Keras backends (Dlib, SFace, ...) only expose single-image forward()
+    return [model.forward(img[np.newaxis]) for img in batch]
+
+
+class _Request:
+    __slots__ = ("face", "model_name", "done", "embedding", "error")
+
+    def __init__(self, face: np.ndarray, model_name: str):
+        self.face = face
+        self.model_name = model_name
+        self.done = threading.Event()
+        self.embedding = None
+        self.error = None
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batching for embedding inference.
+
+    Callers on any thread (HTTP executor workers, RTSP stream threads) submit
+    one face crop and block; a single scheduler thread collects crops for up
+    to `window_ms` or `max_batch` items, runs one batched forward pass per
+    model and hands each embedding back to its caller.
+    """
+
+    def __init__(self, max_batch: int = 16, window_ms: float = 5.0):
+        self.max_batch = max_batch
+        self.window_ms = window_ms
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._batch_sizes = {}  # { batch size: count }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def embed(self, face: np.ndarray, model_name: str):
+        return self.embed_many([face], model_name)[0]
+
+    def embed_many(self, faces: list, model_name: str):
+        """Submit several crops at once so they land in the same batch."""
+        self._ensure_started()
+        requests = [_Request(face, model_name) for face in faces]
+        for request in requests:
+            self._queue.put(request)
+        for request in requests:
+            request.done.wait()
+            if request.error is not None:
+                raise request.error
+        return [request.embedding for request in requests]
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_ms / 1000
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            # A config switch can leave crops for two models in one window
+            by_model = {}
+            for request in batch:
+                by_model.setdefault(request.model_name, []).append(request)
+
+            for model_name, requests in by_model.items():
+                try:
+                    embeddings = batch_forward(model_name, [r.face for r in requests])
+                    for request, embedding in zip(requests, embeddings):
+                        request.embedding = embedding
+                except Exception as e:
+                    for request in requests:
+                        request.error = e
+                finally:
+                    for request in requests:
+                        request.done.set()
+                self._batches += 1
+                self._items += len(requests)
+                self._batch_sizes[len(requests)] = self._batch_sizes.get(len(requests), 0) + 1
+
+    def stats(self):
+        return {
+            "max_batch": self.max_batch,
+            "window_ms": self.window_ms,
+            "pending": self._queue.qsize(),
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items()))
+        }
+
+
+embedding_batcher = EmbeddingBatcher(
+    max_batch=int(os.getenv("FRS_MAX_BATCH", "16")),
+    window_ms=float(os.getenv("FRS_BATCH_WINDOW_MS", "5"))
+)
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class FrameBroadcaster:
+    """
+    Shared MJPEG preview for one RTSP stream.
+
+    The capture thread publishes raw frames; each new frame is downscaled and
+    JPEG-encoded once (and only while someone is watching, at most `max_fps`
+    times a second). The encoded bytes are then fanned out to every async
+    subscriber, which only wakes up when the sequence number moves.
+    """
+
+    def __init__(self, width: int = 640, quality: int = 80, max_fps: float = 15.0):
+        self.width = width          # 0 keeps the native resolution
+        self.quality = quality
+        self.max_fps = max_fps
+        self.seq = 0
+        self.jpeg = None
+        self.closed = False
+        self.encodes = 0
+        self._last_encode = 0.0
+        self._lock = threading.Lock()
+        self._subscribers = {}      # { token: (loop, asyncio.Event) }
+
+    @property
+    def viewers(self):
+        return len(self._subscribers)
+
+    def _encode(self, frame: np.ndarray):
+        if self.width and frame.shape[1] > self.width:
+            height = int(frame.shape[0] * self.width / frame.shape[1])
+            frame = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buffer.tobytes() if ret else None
+
+    def _wake_all(self):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass # Subscriber's loop already closed
+
+    def publish(self, frame: np.ndarray):
+        if not self._subscribers:
+            return
+        now = time.perf_counter()
+        if now - self._last_encode < 1.0 / self.max_fps:
+            return
+        self._last_encode = now
+
+        jpeg = self._encode(frame)
+        if jpeg is None:
+            return
+        with self._lock:
+            self.jpeg = jpeg
+            self.seq += 1
+            self.encodes += 1
+        self._wake_all()
+
+    def close(self):
+        self.closed = True
+        self._wake_all()
+
+    async def frames(self):
+        """Async generator of multipart MJPEG chunks, one per new frame."""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        token = object()
+        with self._lock:
+            self._subscribers[token] = (loop, event)
+        last_seq = 0
+        try:
+            while not self.closed:
+                if self.seq == last_seq:
+                    await event.wait()
+                    event.clear()
+                    continue
+                with self._lock:
+                    last_seq, jpeg = self.seq, self.jpeg
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            with self._lock:
+                self._subscribers.pop(token, None)
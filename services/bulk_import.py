@@ -0,0 +1,372 @@
+import csv
+import io
+import json
+import os
+import re
+import threading
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import models
+from database import SessionLocal
+from services import face_service
+from services.gallery import gallery
+
+IMPORT_ROOT = os.getenv("FRS_IMPORT_ROOT", "imports") # server-side directories must live under here
+JOBS_DIR = os.path.join(IMPORT_ROOT, ".jobs")         # uploaded archives + resume checkpoints
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{12}")          # uuid4().hex[:12], see _new_job_id
+
+bulk_jobs = {} # { job_id: BulkImportJob }
+
+
+def _parse_manifest(raw: bytes, filename: str):
+    """CSV with filename,name columns, or JSON {filename: name} / [{"filename", "name"}]."""
+    if filename.lower().endswith(".json"):
+        data = json.loads(raw.decode("utf-8"))
+        if isinstance(data, dict):
+            return {str(k): str(v) for k, v in data.items()}
+        return {str(item["filename"]): str(item["name"]) for item in data}
+    reader = csv.DictReader(io.StringIO(raw.decode("utf-8-sig")))
+    return {row["filename"].strip(): row["name"].strip() for row in reader if row.get("filename")}
+
+
+def _default_name(filename: str):
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+class BulkImportJob:
+    """
+    Enrols many images at once: embeddings are computed in parallel (the
+    worker threads share the embedding batcher, so crops get batched), users
+    are inserted `batch_size` at a time in one transaction, and every
+    committed filename is checkpointed so an interrupted job can resume.
+
+    The checkpoint is a small state file plus an append-only log with one
+    line per finished file, so each batch costs O(batch) to record. At most
+    `workers * 2` images are read/embedded ahead of the commits, which keeps
+    memory flat however large the archive.
+    """
+
+    def __init__(self, job_id: str, source: dict, workers: int = 4, batch_size: int = 100):
+        self.job_id = job_id
+        self.source = source # {"type": "zip", "path": ...} or {"type": "directory", "path": ..., "manifest": ...}
+        self.workers = workers
+        self.batch_size = batch_size
+        self.checkpoint_path = os.path.join(JOBS_DIR, f"{job_id}.json")
+        self.log_path = os.path.join(JOBS_DIR, f"{job_id}.log") # JSON lines: {"filename"[, "reason"]}
+        self.status = "pending"
+        self.total = 0
+        self.done = set()      # filenames already committed or reported
+        self.succeeded = 0
+        self.failed = []       # [{"filename", "reason"}]
+        self.started_at = None
+        self.finished_at = None
+        self.elapsed = 0.0     # seconds spent processing across runs
+        self.images_this_run = 0
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._archive = None
+        self._archive_lock = threading.Lock()
+        self._thread = None
+        self._unsaved = []     # log lines not yet appended to the checkpoint
+
+    # --- Source handling ---
+
+    def _list_items(self):
+        if self.source["type"] == "zip":
+            with zipfile.ZipFile(self.source["path"]) as archive:
+                names = archive.namelist()
+                manifest = {}
+                for candidate in ("manifest.csv", "manifest.json"):
+                    if candidate in names:
+                        manifest = _parse_manifest(archive.read(candidate), candidate)
+                        break
+            files = [n for n in names if n.lower().endswith(IMAGE_EXTENSIONS) and not n.endswith("/")]
+        else:
+            directory = self.source["path"]
+            manifest = {}
+            if self.source.get("manifest"):
+                with open(self.source["manifest"], "rb") as f:
+                    manifest = _parse_manifest(f.read(), self.source["manifest"])
+            files = sorted(
+                os.path.relpath(os.path.join(root, f), directory)
+                for root, _, filenames in os.walk(directory)
+                for f in filenames if f.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        if manifest:
+            files = [f for f in files if f in manifest or os.path.basename(f) in manifest]
+        return [(f, manifest.get(f) or manifest.get(os.path.basename(f)) or _default_name(f)) for f in files]
+
+    def _read(self, filename: str) -> bytes:
+        if self._archive is not None:
+            # ZipFile members share one file handle
+            with self._archive_lock:
+                return self._archive.read(filename)
+        with open(os.path.join(self.source["path"], filename), "rb") as f:
+            return f.read()
+
+    # --- Checkpointing ---
+
+    def _save_checkpoint(self):
+        # Caller holds self._lock
+        if self._unsaved:
+            with open(self.log_path, "a") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in self._unsaved)
+            self._unsaved = []
+        state = {
+            "job_id": self.job_id,
+            "source": self.source,
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "status": self.status,
+            "elapsed": self.elapsed
+        }
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _record(self, filename, reason: str = None):
+        # Caller holds self._lock
+        entry = {"filename": filename}
+        if reason is not None:
+            entry["reason"] = reason
+            self.failed.append(entry)
+        else:
+            self.succeeded += 1
+        if filename is not None:
+            self.done.add(filename)
+        self._unsaved.append(entry)
+
+    @classmethod
+    def from_checkpoint(cls, job_id: str):
+        with open(_checkpoint_path(job_id)) as f:
+            state = json.load(f)
+        # Checkpoints written before the settings were stored resume with the defaults
+        settings = {key: state[key] for key in ("workers", "batch_size") if key in state}
+        job = cls(job_id, state["source"], **settings)
+        if os.path.exists(job.log_path):
+            with open(job.log_path) as f:
+                lines = f.readlines()
+            for count, line in enumerate(lines):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line of a crashed run: cut it off so new lines append cleanly; that file is redone
+                    with open(job.log_path, "w") as f:
+                        f.writelines(lines[:count])
+                    break
+                job._record(entry["filename"], entry.get("reason"))
+            job._unsaved = []
+        job.elapsed = state.get("elapsed", 0.0)
+        # A job checkpointed mid-run was cut short by a restart
+        job.status = "interrupted" if state.get("status") in (None, "running") else state["status"]
+        return job
+
+    # --- Processing ---
+
+    def _embed(self, item: tuple):
+        filename, name = item
+        if self._cancel.is_set():
+            return None
+        try:
+            image_data = self._read(filename)
+            img = face_service.decode_image_bytes(image_data)
+            faces = face_service.drop_placeholder_faces(face_service.detect_faces(img), img)
+            if not faces:
+                return filename, name, None, "No face detected"
+            model_name = face_service.GLOBAL_CONFIG["model_name"]
+            embedding = face_service.represent_face(faces[0]["face"], model_name)
+            return filename, name, (image_data, face_service.make_thumbnail(img), embedding, model_name), None
+        except Exception as e:
+            return filename, name, None, str(e)
+
+    def _commit(self, batch: list):
+        db = SessionLocal()
+        try:
+            users = []
+            for _, name, (image_data, thumbnail, embedding, model_name) in batch:
+                user = models.User(
+                    name=name,
+                    image_path=face_service._db_image_path("bulk"),
+                    image_data=image_data,
+                    thumbnail=thumbnail
+                )
+                face_service.set_user_embedding(user, embedding, model_name)
+                users.append(user)
+            db.add_all(users)
+            # Ids come back from the INSERT; after commit() they would be refreshed
+            # with one SELECT per user, blobs included
+            db.flush()
+            committed = [(user.id, user.name) for user in users]
+            db.commit()
+        finally:
+            db.close()
+        for (user_id, name), (_, _, (_, _, embedding, model_name)) in zip(committed, batch):
+            gallery.upsert(user_id, name, embedding, model_name)
+        with self._lock:
+            for filename, _, _ in batch:
+                self._record(filename)
+            self._save_checkpoint()
+
+    def _run(self):
+        run_start = time.perf_counter()
+        self.status = "running"
+        self.started_at = time.time()
+        self.images_this_run = 0
+        try:
+            items = self._list_items()
+            self.total = len(items)
+            pending = [(f, n) for f, n in items if f not in self.done]
+
+            if self.source["type"] == "zip":
+                self._archive = zipfile.ZipFile(self.source["path"])
+
+            batch = []
+            pending = iter(pending)
+            in_flight = deque()
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk-import") as pool:
+                while True:
+                    # Read/embed only a bounded window ahead of the commits
+                    for item in pending:
+                        in_flight.append(pool.submit(self._embed, item))
+                        if len(in_flight) >= self.workers * 2:
+                            break
+                    if not in_flight:
+                        break
+                    result = in_flight.popleft().result()
+                    if result is None:
+                        continue
+                    filename, name, payload, error = result
+                    self.images_this_run += 1
+                    if error:
+                        with self._lock:
+                            self._record(filename, error)
+                    else:
+                        batch.append((filename, name, payload))
+                    if len(batch) >= self.batch_size:
+                        self._commit(batch)
+                        batch = []
+            if batch:
+                self._commit(batch)
+            self.status = "cancelled" if self._cancel.is_set() else "completed"
+        except Exception as e:
+            print(f"Bulk import {self.job_id} failed: {e}")
+            self.status = "failed"
+            with self._lock:
+                self._record(None, str(e))
+        finally:
+            if self._archive is not None:
+                self._archive.close()
+                self._archive = None
+            self.elapsed += time.perf_counter() - run_start
+            self.finished_at = time.time()
+            with self._lock:
+                self._save_checkpoint()
+            if self.status == "completed" and self.source["type"] == "zip":
+                # Nothing left to resume from
+                os.remove(self.source["path"])
+
+    def start(self):
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        self._cancel.clear()
+        self._thread = threading.Thread(target=self._run, name=f"bulk-import-{self.job_id}", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def progress(self):
+        processed = len(self.done)
+        run_seconds = (time.time() - self.started_at) if self.status == "running" and self.started_at else None
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "source": self.source["type"],
+            "total": self.total,
+            "processed": processed,
+            "succeeded": self.succeeded,
+            "failed": len(self.failed),
+            "failures": self.failed[-50:],
+            "percent": round(processed / self.total * 100, 1) if self.total else 0.0,
+            "images_per_sec": round(self.images_this_run / run_seconds, 2) if run_seconds
+                              else (round(self.images_this_run / self.elapsed, 2) if self.elapsed else 0.0)
+        }
+
+
+def _safe_import_path(path: str):
+    root = os.path.realpath(IMPORT_ROOT)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise Exception(f"Path must be inside the import root ({IMPORT_ROOT}).")
+    return resolved
+
+
+def _new_job_id():
+    return uuid.uuid4().hex[:12]
+
+
+def _checkpoint_path(job_id: str):
+    # job_id comes from the URL and is joined into JOBS_DIR
+    if not JOB_ID_PATTERN.fullmatch(job_id):
+        raise Exception("Import job not found.")
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def start_zip_import(archive_bytes: bytes, workers: int = 4, batch_size: int = 100):
+    if not zipfile.is_zipfile(io.BytesIO(archive_bytes)):
+        raise Exception("Uploaded file is not a ZIP archive.")
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    job_id = _new_job_id()
+    # The archive is kept until the job completes so an interrupted import can resume
+    archive_path = os.path.join(JOBS_DIR, f"{job_id}.zip")
+    with open(archive_path, "wb") as f:
+        f.write(archive_bytes)
+    job = BulkImportJob(job_id, {"type": "zip", "path": archive_path}, workers, batch_size)
+    bulk_jobs[job_id] = job
+    job.start()
+    return job.progress()
+
+
+def start_directory_import(directory: str, manifest: str = None, workers: int = 4, batch_size: int = 100):
+    path = _safe_import_path(directory)
+    if not os.path.isdir(path):
+        raise Exception("Directory not found.")
+    source = {"type": "directory", "path": path}
+    if manifest:
+        source["manifest"] = _safe_import_path(manifest)
+    job_id = _new_job_id()
+    job = BulkImportJob(job_id, source, workers, batch_size)
+    bulk_jobs[job_id] = job
+    job.start()
+    return job.progress()
+
+
+def get_import(job_id: str):
+    job = bulk_jobs.get(job_id)
+    if job is None and os.path.exists(_checkpoint_path(job_id)):
+        job = bulk_jobs[job_id] = BulkImportJob.from_checkpoint(job_id)
+    if job is None:
+        raise Exception("Import job not found.")
+    return job
+
+
+def resume_import(job_id: str):
+    job = get_import(job_id)
+    if job.status in ("running", "completed"):
+        raise Exception(f"Import job is already {job.status}.")
+    job.start()
+    return job.progress()
+
+
+def cancel_import(job_id: str):
+    job = get_import(job_id)
+    job.cancel()
+    return job.progress()
+
+
+def list_imports():
+    return [job.progress() for job in bulk_jobs.values()]
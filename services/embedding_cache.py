@@ -0,0 +1,148 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+# Per-face fields worth caching: everything up to (not including) the gallery match
+CACHED_FIELDS = ("facial_area", "confidence", "embedding", "model_name", "attributes", "attribute_tasks")
+
+
+def dhash(img: np.ndarray) -> int:
+    """64-bit difference hash: survives re-encoding and small lighting changes, not crops or motion."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU + TTL cache of detection/embedding/attribute results for
+    verification inputs, so a kiosk or webcam resubmitting the same picture
+    skips detect, represent and analyze. Gallery matching is never cached;
+    callers redo it on every hit so new enrolments and deletions count.
+
+    Entries are keyed by a hash of the decoded pixels ("exact"), or in
+    "phash" mode additionally found by a difference hash within
+    `max_distance` bits for near-duplicates. Embeddings depend on the model
+    and detector, so the cache empties itself whenever those change;
+    attributes are kept with the tasks they were computed for.
+    """
+
+    def __init__(self, mode: str = "exact", max_entries: int = 256, ttl_s: float = 60.0, max_distance: int = 4):
+        self.mode = mode            # "off", "exact" or "phash"
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.max_distance = max_distance
+        self._entries = OrderedDict() # { content hash: (stored_at, dhash or None, faces, nbytes) }
+        self._config = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.mode in ("exact", "phash") and self.max_entries > 0
+
+    @staticmethod
+    def content_key(img: np.ndarray) -> bytes:
+        # sha256 is hardware-accelerated on current CPUs, ~2x faster than blake2b on a 720p frame
+        digest = hashlib.sha256(np.ascontiguousarray(img).data)
+        digest.update(str(img.shape).encode())
+        return digest.digest()[:16]
+
+    def _drop(self, key):
+        _, _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _check_config(self, config: tuple):
+        if config != self._config:
+            self._entries.clear()
+            self._bytes = 0
+            self._config = config
+
+    def get(self, img: np.ndarray, config: tuple, require_tasks: tuple = None):
+        """
+        Cached faces for img under config (fresh dicts without a match), or
+        None. With require_tasks, entries lacking attributes for exactly those
+        tasks count as a miss.
+        """
+        key = self.content_key(img)
+        phash = dhash(img) if self.mode == "phash" else None
+        now = time.monotonic()
+        with self._lock:
+            self._check_config(config)
+            entry = self._entries.get(key)
+            near = False
+            if entry is None and phash is not None:
+                # Small bounded cache, so a linear Hamming scan is cheaper than any index
+                for other_key, other in self._entries.items():
+                    if other[1] is not None and (other[1] ^ phash).bit_count() <= self.max_distance:
+                        key, entry, near = other_key, other, True
+                        break
+            if entry is not None and now - entry[0] > self.ttl_s:
+                self._drop(key)
+                entry = None
+            if entry is not None and require_tasks and any(f["attribute_tasks"] != require_tasks for f in entry[2]):
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.near_hits += near
+            return [dict(face) for face in entry[2]]
+
+    def put(self, img: np.ndarray, config: tuple, faces: list):
+        """Store faces for img; returns the stored per-face dicts (e.g. to fill in attributes later)."""
+        stored = [{field: face.get(field) for field in CACHED_FIELDS} for face in faces]
+        for face in stored:
+            # float32 instead of a list of Python floats: 4 bytes per dimension rather than ~32
+            face["embedding"] = np.asarray(face["embedding"], dtype=np.float32)
+        nbytes = sum(face["embedding"].nbytes + 512 for face in stored) # + rough dict/attribute overhead
+        key = self.content_key(img)
+        phash = dhash(img) if self.mode == "phash" else None
+        with self._lock:
+            self._check_config(config)
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic(), phash, stored, nbytes)
+            self._bytes += nbytes
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return stored
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "approx_bytes": self._bytes,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+embedding_cache = EmbeddingCache(
+    mode=os.getenv("FRS_EMBEDDING_CACHE", "exact"),
+    max_entries=int(os.getenv("FRS_EMBEDDING_CACHE_SIZE", "256")),
+    ttl_s=float(os.getenv("FRS_EMBEDDING_CACHE_TTL_S", "60"))
+)
@@ -0,0 +1,120 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.metrics import record_stage, registry
+
+
+class ExecutorBusy(Exception):
+    """Raised when the inference queue is full; the HTTP layer maps it to a 503."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Inference queue is full, please retry shortly.")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Bounded worker pool for blocking face_service calls (DeepFace, decoding,
+    synchronous SQLAlchemy) so async endpoints can await them without stalling
+    the event loop. At most `workers` jobs run and `max_queue` more may wait;
+    anything beyond that is rejected immediately instead of piling up.
+
+    Threads rather than processes: jobs carry SQLAlchemy sessions and
+    UploadFile handles, and TensorFlow releases the GIL during inference.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 16, retry_after: int = 1):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._started = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _run_job(self, submitted_at: float, fn, args, kwargs):
+        wait = time.perf_counter() - submitted_at
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._started += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+        record_stage("queue_wait", wait)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+
+    def _job_done(self, future):
+        # Also reached by jobs cancelled before they started (caller cancelled, shutdown),
+        # which never ran _run_job; a started job cannot be cancelled any more
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+        self._slots.release()
+
+    async def run(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorBusy(self.retry_after)
+        with self._lock:
+            self._queued += 1
+        # Carry context variables (e.g. the request's metrics trace) into the worker thread
+        ctx = contextvars.copy_context()
+        try:
+            future = self._pool.submit(ctx.run, self._run_job, time.perf_counter(), fn, args, kwargs)
+        except RuntimeError:
+            # Pool already shut down
+            with self._lock:
+                self._queued -= 1
+            self._slots.release()
+            raise ExecutorBusy(self.retry_after)
+        future.add_done_callback(self._job_done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._lock:
+            started = self._started
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._total_wait / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 2)
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+inference_executor = InferenceExecutor(
+    workers=int(os.getenv("FRS_INFERENCE_WORKERS", "2")),
+    max_queue=int(os.getenv("FRS_INFERENCE_QUEUE", "16"))
+)
+
+
+def _collect_executor_metrics():
+    stats = inference_executor.stats()
+    return [
+        ("frs_inference_queued", "gauge", "Inference jobs waiting for a worker.", [({}, stats["queued"])]),
+        ("frs_inference_running", "gauge", "Inference jobs running.", [({}, stats["running"])]),
+        ("frs_inference_rejected_total", "counter", "Inference jobs rejected with 503.", [({}, stats["rejected"])]),
+    ]
+
+registry.register_collector(_collect_executor_metrics)
@@ -0,0 +1,71 @@
+import os
+import cv2
+import numpy as np
+
+# Thresholds for the cheap checks that run before detection/embedding on RTSP
+# frames. Setting a threshold to 0 disables that gate.
+GATE_CONFIG = {
+    "motion_width": 160,        # px, frames are diffed at this width in grayscale
+    "motion_pixel_delta": 25,   # gray levels a pixel must change by to count as moving
+    "motion_threshold": float(os.getenv("FRS_GATE_MOTION", "0.002")), # fraction of moving pixels
+    "motion_keepalive_s": 2.0,  # a still scene is still analyzed this often, so standing faces keep their tracks
+    "min_face_px": int(os.getenv("FRS_GATE_MIN_FACE_PX", "40")),            # shorter side of the face box
+    "min_sharpness": float(os.getenv("FRS_GATE_MIN_SHARPNESS", "20")),      # variance of the Laplacian
+    "min_brightness": float(os.getenv("FRS_GATE_MIN_BRIGHTNESS", "40")),    # mean gray level of the crop
+    "max_brightness": float(os.getenv("FRS_GATE_MAX_BRIGHTNESS", "220")),
+}
+
+
+def sharpness(gray: np.ndarray) -> float:
+    """Variance of the Laplacian; low values mean a blurred (or flat) image."""
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class MotionGate:
+    """
+    Per-stream frame-difference check. Each sampled frame is shrunk to a tiny
+    grayscale thumbnail and compared with the previous one; frames where
+    (almost) nothing moved are skipped before face detection runs.
+    """
+
+    def __init__(self):
+        self._previous = None
+        self._last_pass = 0.0
+
+    def check(self, frame: np.ndarray, now: float) -> bool:
+        threshold = GATE_CONFIG["motion_threshold"]
+        if not threshold:
+            return True
+        height, width = frame.shape[:2]
+        small_width = min(GATE_CONFIG["motion_width"], width)
+        small = cv2.resize(frame, (small_width, max(1, int(height * small_width / width))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        previous, self._previous = self._previous, gray
+
+        if previous is None or previous.shape != gray.shape or now - self._last_pass >= GATE_CONFIG["motion_keepalive_s"]:
+            self._last_pass = now
+            return True
+        moving = np.count_nonzero(cv2.absdiff(gray, previous) > GATE_CONFIG["motion_pixel_delta"])
+        if moving < threshold * gray.size:
+            return False
+        self._last_pass = now
+        return True
+
+
+def face_rejection(face: dict):
+    """
+    Why a detected face is not worth embedding ("small", "exposure" or
+    "blurry"), or None if it passes. Cheapest check first.
+    """
+    area = face["facial_area"]
+    if min(area.get("w", 0), area.get("h", 0)) < GATE_CONFIG["min_face_px"]:
+        return "small"
+    gray = cv2.cvtColor(face["face"], cv2.COLOR_BGR2GRAY)
+    brightness = float(gray.mean())
+    if (GATE_CONFIG["min_brightness"] and brightness < GATE_CONFIG["min_brightness"]) or \
+            (GATE_CONFIG["max_brightness"] and brightness > GATE_CONFIG["max_brightness"]):
+        return "exposure"
+    if GATE_CONFIG["min_sharpness"] and sharpness(gray) < GATE_CONFIG["min_sharpness"]:
+        return "blurry"
+    return None
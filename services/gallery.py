@@ -0,0 +1,424 @@
+import os
+import threading
+import time
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+import models
+from services.ann_index import IVFIndex
+
+INDEX_CONFIG = {
+    "engine": os.getenv("FRS_INDEX_ENGINE", "exact"), # "exact" or "ivf"
+    "nlist": 256,       # number of k-means cells
+    "nprobe": 8,        # cells scanned per query (higher = better recall, slower)
+    "min_size": 10000,  # below this many users the exact scan is used anyway
+    "path": os.getenv("FRS_INDEX_PATH", "ann_index.npz")
+}
+
+
+class FaceGallery:
+    """
+    Resident copy of every enrolled embedding, kept as a pre-normalized float32
+    matrix so a probe is scored against all users with one matrix-vector product.
+    Rows are updated incrementally by the user CRUD paths in face_service.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        self._lock = threading.RLock()
+        self._capacity = initial_capacity
+        self._dim = None
+        self._matrix = None  # (capacity, dim) float32, only the first _size rows are live
+        self._ids = np.zeros(initial_capacity, dtype=np.int64)
+        self._names = {}      # { user_id: name }
+        self._rows = {}       # { user_id: row index }
+        self._size = 0
+        self._loaded = False
+        self._index = None
+        self._index_changes = [] # sets of user ids touched while an index is trained off-lock
+        self.model_name = None # only embeddings produced by this model are loaded
+        self._listeners = []   # callables(op, *args) mirroring changes into other processes
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def dim(self):
+        return self._dim
+
+    def add_listener(self, listener):
+        """Called as listener(op, *args) after every upsert/remove/rename, and on reload for a new model."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, op: str, *args):
+        for listener in self._listeners:
+            try:
+                listener(op, *args)
+            except Exception as e:
+                print(f"Gallery: listener failed on {op}: {e}")
+
+    def ensure_loaded(self, db: Session):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self.load(db)
+
+    def load(self, db: Session, model_name: str = None):
+        """(Re)build the gallery from the users table, skipping the image blobs."""
+        model_name = model_name or self.model_name
+        previous_model = self.model_name
+        query = db.query(models.User.id, models.User.name, models.User.embedding)
+        if model_name:
+            # Vectors from another model are not comparable; they wait for the re-embedding job
+            query = query.filter(or_(models.User.embedding_model == model_name, models.User.embedding_model.is_(None)))
+        rows = [r for r in query.all() if r[2] is not None and len(r[2]) > 0]
+        if rows:
+            dim = len(rows[0][2])
+            rows = [r for r in rows if len(r[2]) == dim]
+        self.load_vectors(
+            [r[0] for r in rows],
+            [r[1] for r in rows],
+            # Embeddings arrive as float32 views over the row bytes, so this is one stack
+            np.vstack([r[2] for r in rows]) if rows else None,
+            model_name
+        )
+        if model_name != previous_model:
+            self._notify("reload", model_name)
+
+    def load_vectors(self, ids: list, names: list, vectors, model_name: str = None):
+        """Replace the gallery contents with the given (n, dim) vectors, e.g. a synthetic benchmark gallery."""
+        with self._lock:
+            self._reset()
+            self.model_name = model_name
+            if len(ids):
+                vectors = np.asarray(vectors, dtype=np.float32)
+                self._dim = vectors.shape[1]
+                self._capacity = max(self._capacity, len(ids))
+                self._matrix = np.zeros((self._capacity, self._dim), dtype=np.float32)
+                self._ids = np.zeros(self._capacity, dtype=np.int64)
+                # One vectorized normalization for the whole gallery
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                self._matrix[:len(ids)] = vectors / norms
+                self._ids[:len(ids)] = ids
+                self._rows = {int(user_id): row for row, user_id in enumerate(ids)}
+                self._names = {int(user_id): name for user_id, name in zip(ids, names)}
+                self._size = len(ids)
+            self._loaded = True
+            needs_build = INDEX_CONFIG["engine"] == "ivf" and not self._restore_index()
+        if needs_build and self._size >= INDEX_CONFIG["min_size"]:
+            self.build_index()
+
+    def _reset(self):
+        self._capacity = max(len(self._ids), 1)
+        self._dim = None
+        self._matrix = None
+        self._names = {}
+        self._rows = {}
+        self._size = 0
+        self._index = None
+
+    def _grow(self):
+        self._capacity *= 2
+        matrix = np.zeros((self._capacity, self._dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+        ids = np.zeros(self._capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        self._ids = ids
+
+    @staticmethod
+    def _normalize(embedding):
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return vec
+        return vec / norm
+
+    def _upsert(self, user_id: int, name: str, embedding):
+        vec = self._normalize(embedding)
+        if self._dim is None:
+            self._dim = vec.shape[0]
+            self._matrix = np.zeros((self._capacity, self._dim), dtype=np.float32)
+        if vec.shape[0] != self._dim:
+            print(f"Gallery: skipping user {user_id}, embedding dim {vec.shape[0]} != {self._dim}")
+            self._remove(user_id)
+            return
+
+        row = self._rows.get(user_id)
+        if row is None:
+            if self._size == self._capacity:
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._rows[user_id] = row
+            self._ids[row] = user_id
+        self._matrix[row] = vec
+        self._names[user_id] = name
+        if self._index is not None:
+            self._index.add(user_id, vec)
+        for changes in self._index_changes:
+            changes.add(user_id)
+
+    def _remove(self, user_id: int):
+        if self._index is not None:
+            self._index.remove(user_id)
+        for changes in self._index_changes:
+            changes.add(user_id)
+        row = self._rows.pop(user_id, None)
+        self._names.pop(user_id, None)
+        if row is None:
+            return
+        # Swap the last live row into the hole so the live block stays contiguous
+        last = self._size - 1
+        if row != last:
+            moved_id = int(self._ids[last])
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._size -= 1
+
+    def upsert(self, user_id: int, name: str, embedding, model_name: str = None, notify: bool = True):
+        with self._lock:
+            if model_name and self.model_name and model_name != self.model_name:
+                self._remove(user_id)
+            else:
+                self._upsert(user_id, name, embedding)
+        if notify:
+            self._notify("upsert", user_id, name, np.asarray(embedding, dtype=np.float32), model_name)
+
+    def remove(self, user_id: int, notify: bool = True):
+        with self._lock:
+            self._remove(user_id)
+        if notify:
+            self._notify("remove", user_id)
+
+    def rename(self, user_id: int, name: str, notify: bool = True):
+        with self._lock:
+            if user_id in self._names:
+                self._names[user_id] = name
+        if notify:
+            self._notify("rename", user_id, name)
+
+    def apply(self, op: str, *args):
+        """Replay a change notified by another process's gallery without notifying again."""
+        getattr(self, op)(*args, notify=False)
+
+    def swap(self, staged: "FaceGallery", on_swap=None):
+        """
+        Take over the contents of a gallery built off to the side (e.g. for a
+        new model) in one step. on_swap runs under the lock too, so searches
+        never see the new vectors without it (the live config switch).
+        """
+        with self._lock, staged._lock:
+            for attr in ("_capacity", "_dim", "_matrix", "_ids", "_names", "_rows", "_size", "_loaded", "_index",
+                         "model_name"):
+                setattr(self, attr, getattr(staged, attr))
+            staged.__init__()
+            if on_swap is not None:
+                on_swap()
+        self._notify("reload", self.model_name)
+
+    def _use_index(self):
+        return (
+            INDEX_CONFIG["engine"] == "ivf"
+            and self._index is not None
+            and self._index.is_trained
+            and self._size >= INDEX_CONFIG["min_size"]
+        )
+
+    def _top_k(self, query, rows, k):
+        distances = 1.0 - self._matrix[rows] @ query
+        k = min(k, len(rows))
+        if k < len(rows):
+            top = np.argpartition(distances, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(distances[top])]
+        return [(int(self._ids[rows[i]]), self._names.get(int(self._ids[rows[i]])), float(distances[i])) for i in top]
+
+    def search(self, probe, k: int = 1, exact: bool = False):
+        """
+        Return up to k (user_id, name, cosine_distance) tuples, closest first.
+        With the IVF engine enabled, only the candidates proposed by the index
+        are scored, but the returned distances are always exact.
+        """
+        query = self._normalize(probe)
+        with self._lock:
+            if self._size == 0 or query.shape[0] != self._dim:
+                return []
+            if not exact and self._use_index():
+                candidate_ids = self._index.candidates(query, INDEX_CONFIG["nprobe"])
+                rows = np.fromiter(
+                    (self._rows[i] for i in candidate_ids if i in self._rows),
+                    dtype=np.int64
+                )
+            else:
+                rows = np.arange(self._size)
+            if len(rows) == 0:
+                return []
+            return self._top_k(query, rows, k)
+
+    def search_many(self, probes, k: int = 1, model_name: str = None):
+        """
+        Batched search for several probes (e.g. every face in a frame).
+        The exact path scores all of them with one matrix-matrix product.
+        Probes embedded by `model_name` are refused while the gallery holds
+        another model's vectors (a model switch landing mid-request).
+        """
+        probes = np.atleast_2d(np.asarray(probes, dtype=np.float32))
+        if len(probes) == 0:
+            return []
+        with self._lock:
+            if model_name and self.model_name and model_name != self.model_name:
+                raise Exception(f"The gallery now holds {self.model_name} embeddings; retry the request.")
+            if self._size == 0 or probes.shape[1] != self._dim:
+                return [[] for _ in probes]
+            if self._use_index():
+                return [self.search(probe, k=k) for probe in probes]
+
+            norms = np.linalg.norm(probes, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            distances = 1.0 - (probes / norms) @ self._matrix[:self._size].T
+            k = min(k, self._size)
+            if k < self._size:
+                top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            else:
+                top = np.tile(np.arange(self._size), (len(probes), 1))
+            order = np.argsort(np.take_along_axis(distances, top, axis=1), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+
+            results = []
+            for q, rows in enumerate(top):
+                results.append([
+                    (int(self._ids[r]), self._names.get(int(self._ids[r])), float(distances[q, r]))
+                    for r in rows
+                ])
+            return results
+
+    # --- ANN index management ---
+
+    def _index_path(self):
+        # Centroids are trained in one model's embedding space, so each model keeps its own file
+        if not self.model_name:
+            return INDEX_CONFIG["path"]
+        root, ext = os.path.splitext(INDEX_CONFIG["path"])
+        return f"{root}.{self.model_name}{ext}"
+
+    def _restore_index(self):
+        """Attach the persisted quantizer for this model, if any. Caller holds the lock."""
+        path = self._index_path()
+        if not os.path.exists(path):
+            return False
+        try:
+            index = IVFIndex.load(path)
+            index.nprobe = INDEX_CONFIG["nprobe"]
+            if index.centroids.shape[1] != self._dim:
+                print(f"Gallery: ignoring {path}, dimension does not match the gallery")
+                return False
+        except Exception as e:
+            print(f"Gallery: failed to load IVF index from {path}: {e}")
+            return False
+        # Only the centroids are persisted; the lists are rebuilt from the gallery itself
+        index.add_many(self._ids[:self._size], self._matrix[:self._size])
+        self._index = index
+        print(f"Gallery: restored IVF index from {path} ({index.nlist} lists)")
+        return True
+
+    def build_index(self, nlist: int = None, nprobe: int = None):
+        """
+        Train a fresh IVF quantizer on the live gallery and persist it.
+        k-means runs on a snapshot outside the lock, so searches keep being
+        served during the build; changes made meanwhile are replayed before
+        the new index is swapped in.
+        """
+        if nlist is not None:
+            INDEX_CONFIG["nlist"] = nlist
+        if nprobe is not None:
+            INDEX_CONFIG["nprobe"] = nprobe
+        start = time.perf_counter()
+        changes = set()
+        with self._lock:
+            if self._size == 0:
+                raise Exception("Cannot build an index on an empty gallery.")
+            ids = self._ids[:self._size].copy()
+            vectors = self._matrix[:self._size].copy()
+            model_name = self.model_name
+            self._index_changes.append(changes)
+        try:
+            index = IVFIndex(nlist=INDEX_CONFIG["nlist"], nprobe=INDEX_CONFIG["nprobe"])
+            index.train(vectors)
+            index.add_many(ids, vectors)
+            with self._lock:
+                if self.model_name != model_name:
+                    raise Exception("The gallery was reloaded for another model during the index build.")
+                for user_id in changes:
+                    row = self._rows.get(user_id)
+                    if row is None:
+                        index.remove(user_id)
+                    else:
+                        index.add(user_id, self._matrix[row])
+                self._index = index
+        finally:
+            with self._lock:
+                self._index_changes.remove(changes)
+        build_seconds = time.perf_counter() - start
+        try:
+            index.save(self._index_path())
+        except Exception as e:
+            print(f"Gallery: failed to persist IVF index: {e}")
+        return {**index.stats(), "build_seconds": round(build_seconds, 3)}
+
+    def index_stats(self):
+        stats = self._index.stats() if self._index is not None else {"engine": "exact", "trained": False}
+        return {
+            **stats,
+            "configured_engine": INDEX_CONFIG["engine"],
+            "active": self._use_index(),
+            "gallery_size": self._size,
+            "model_name": self.model_name,
+            "min_size": INDEX_CONFIG["min_size"],
+        }
+
+    def recall_check(self, samples: int = 200, k: int = 1, noise: float = 0.05, seed: int = 0):
+        """
+        Compare index search with the exact scan on perturbed gallery vectors.
+        Reports recall@k and the mean latency of both paths.
+        """
+        with self._lock:
+            if self._size == 0:
+                return {"samples": 0}
+            rng = np.random.default_rng(seed)
+            rows = rng.choice(self._size, min(samples, self._size), replace=False)
+            queries = self._matrix[rows] + rng.normal(0, noise, size=(len(rows), self._dim)).astype(np.float32)
+
+        hits, exact_time, ann_time = 0, 0.0, 0.0
+        for query in queries:
+            start = time.perf_counter()
+            exact_ids = {r[0] for r in self.search(query, k=k, exact=True)}
+            exact_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            ann_ids = {r[0] for r in self.search(query, k=k)}
+            ann_time += time.perf_counter() - start
+
+            hits += len(exact_ids & ann_ids) / max(len(exact_ids), 1)
+
+        n = len(queries)
+        return {
+            "samples": n,
+            "k": k,
+            "index_active": self._use_index(),
+            "nprobe": INDEX_CONFIG["nprobe"],
+            "recall_at_k": round(hits / n, 4),
+            "exact_ms": round(exact_time / n * 1000, 3),
+            "ann_ms": round(ann_time / n * 1000, 3),
+        }
+
+
+gallery = FaceGallery()
@@ -0,0 +1,216 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from sqlalchemy import insert, update, bindparam, text
+import models
+from database import SessionLocal
+
+
+class MatchLogWriter:
+    """
+    Asynchronous sink for MatchLog rows.
+
+    Stream threads enqueue events and return immediately; a writer thread
+    drains the queue and flushes with executemany() once `batch_size` events
+    are waiting or `flush_interval` seconds have passed. Row ids are reserved
+    up front from the table's sequence, so callers get the id synchronously
+    and can queue later last_seen / attributes updates against it.
+
+    A batch that fails is retried event by event, so one bad row (e.g. a
+    match for a user deleted while it was queued) is the only one lost.
+    Once stopped, the writer drops new events instead of restarting.
+    """
+
+    def __init__(self, session_factory, batch_size: int = 200, flush_interval: float = 1.0,
+                 max_queue: int = 10000, id_block: int = 100):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.id_block = id_block
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._id_lock = threading.Lock()
+        self._reserved_ids = []
+        self._running = False
+        self._stopped = False
+        self._metrics_lock = threading.Lock() # producers and the writer thread both count
+        self.metrics = {
+            "enqueued": 0,
+            "inserted": 0,
+            "updated": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "errors": 0,
+            "last_flush_rows": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0
+        }
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None or self._stopped:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="match-log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush everything still queued and stop the writer thread."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+            self._running = False
+            self._stopped = True
+        if thread is not None:
+            thread.join(timeout=timeout)
+
+    def _next_id(self) -> int:
+        with self._id_lock:
+            if not self._reserved_ids:
+                db = self.session_factory()
+                try:
+                    rows = db.execute(
+                        text("SELECT nextval(pg_get_serial_sequence('match_logs', 'id')) FROM generate_series(1, :n)"),
+                        {"n": self.id_block}
+                    ).fetchall()
+                finally:
+                    db.close()
+                self._reserved_ids = [row[0] for row in rows]
+            return self._reserved_ids.pop(0)
+
+    def _count(self, **increments):
+        with self._metrics_lock:
+            for key, n in increments.items():
+                self.metrics[key] += n
+
+    def _put(self, event):
+        if self._stopped:
+            self._count(dropped=1)
+            print("MatchLogWriter: writer stopped, dropping event")
+            return False
+        self.start()
+        try:
+            self._queue.put(event, timeout=1.0)
+            self._count(enqueued=1)
+            return True
+        except queue.Full:
+            self._count(dropped=1)
+            print("MatchLogWriter: queue full, dropping event")
+            return False
+
+    def log(self, user_id, score, source: str, image_bytes=None, track_id=None, timestamp=None, attributes=None):
+        log_id = self._next_id()
+        self._put(("insert", {
+            "id": log_id,
+            "user_id": user_id,
+            "confidence_score": score,
+            "source": source,
+            "image_snapshot": image_bytes,
+            "track_id": track_id,
+            "timestamp": timestamp or datetime.now(timezone.utc),
+            "last_seen": None,
+            "attributes": attributes
+        }))
+        return log_id
+
+    def update_last_seen(self, log_id: int, last_seen):
+        self._put(("last_seen", {"b_id": log_id, "b_last_seen": last_seen}))
+
+    def update_attributes(self, log_id: int, attributes: dict):
+        # Attribute analysis finishes after the row was queued, possibly after it was flushed
+        self._put(("attributes", {"b_id": log_id, "b_attributes": attributes}))
+
+    def _drain(self):
+        events = []
+        deadline = time.perf_counter() + self.flush_interval
+        while len(events) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                events.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return events
+
+    @staticmethod
+    def _write(db, events: list):
+        """Execute events (inserts first, then updates) in the current transaction; returns (inserted, updated)."""
+        inserts = [row for kind, row in events if kind == "insert"]
+        updates = [row for kind, row in events if kind == "last_seen"]
+        attribute_updates = [row for kind, row in events if kind == "attributes"]
+        table = models.MatchLog.__table__
+        if inserts:
+            # Snapshot bytes ride along in the same executemany batch
+            db.execute(insert(table), inserts)
+        if updates:
+            db.execute(
+                update(table).where(table.c.id == bindparam("b_id")).values(last_seen=bindparam("b_last_seen")),
+                updates
+            )
+        if attribute_updates:
+            db.execute(
+                update(table).where(table.c.id == bindparam("b_id")).values(attributes=bindparam("b_attributes")),
+                attribute_updates
+            )
+        return len(inserts), len(updates) + len(attribute_updates)
+
+    def _flush(self, events: list):
+        start = time.perf_counter()
+        inserted = updated = errors = 0
+        db = self.session_factory()
+        try:
+            try:
+                inserted, updated = self._write(db, events)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"MatchLogWriter: flush of {len(events)} events failed ({e}), retrying one by one")
+                # Events keep their queue order, so an insert still lands before its updates
+                for event in events:
+                    try:
+                        rows = self._write(db, [event])
+                        db.commit()
+                        inserted += rows[0]
+                        updated += rows[1]
+                    except Exception as e:
+                        db.rollback()
+                        errors += 1
+                        print(f"MatchLogWriter: dropping {event[0]} event for row {event[1].get('id', event[1].get('b_id'))}: {e}")
+        finally:
+            db.close()
+        elapsed = round((time.perf_counter() - start) * 1000, 2)
+        with self._metrics_lock:
+            self.metrics["inserted"] += inserted
+            self.metrics["updated"] += updated
+            self.metrics["errors"] += errors
+            self.metrics["flushes"] += 1
+            self.metrics["last_flush_rows"] = len(events)
+            self.metrics["last_flush_ms"] = elapsed
+            self.metrics["max_flush_ms"] = max(self.metrics["max_flush_ms"], elapsed)
+
+    def _loop(self):
+        while self._running or not self._queue.empty():
+            events = self._drain()
+            if events:
+                self._flush(events)
+
+    def stats(self):
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        return {
+            **metrics,
+            "queued": self._queue.qsize(),
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "running": self._thread is not None
+        }
+
+
+match_log_writer = MatchLogWriter(
+    SessionLocal,
+    batch_size=int(os.getenv("FRS_LOG_BATCH_SIZE", "200")),
+    flush_interval=float(os.getenv("FRS_LOG_FLUSH_INTERVAL", "1.0"))
+)
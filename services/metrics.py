@@ -0,0 +1,200 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers a sub-millisecond gallery scan up to a cold model build
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SLOW_REQUEST_MS = float(os.getenv("FRS_SLOW_REQUEST_MS", "0")) # 0 disables the slow-request log
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {} # { label values: [bucket counts..., sum, count] }
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {values[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {values[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {values[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: tuple):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for key, value in sorted(series.items()):
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = [] # callables returning [(name, type, help, [(labels, value), ...]), ...]
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """Point-in-time values (queue depths, gallery size, ...) read at scrape time."""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Metrics: collector failed: {e}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "frs_stage_duration_seconds", "Time spent in each pipeline stage.", ("stage", "endpoint", "stream")
+)
+request_seconds = registry.histogram(
+    "frs_http_request_duration_seconds", "HTTP request latency.", ("endpoint", "method", "status")
+)
+frame_seconds = registry.histogram(
+    "frs_stream_frame_duration_seconds", "Processing time per analyzed RTSP frame.", ("stream",)
+)
+slow_requests = registry.counter(
+    "frs_slow_requests_total", "Requests or frames slower than FRS_SLOW_REQUEST_MS.", ("endpoint", "stream")
+)
+
+
+# --- Tracing ---
+# A trace collects the stage breakdown of one request or one stream frame.
+# It lives in a context variable, which the inference executor copies into
+# its worker threads, so face_service code records stages without any
+# plumbing. Histograms are observed when the trace finishes, once the
+# endpoint label (the matched route template) is known.
+
+class Trace:
+    __slots__ = ("endpoint", "stream", "stages", "started")
+
+    def __init__(self, endpoint: str = "", stream: str = ""):
+        self.endpoint = endpoint
+        self.stream = stream
+        self.stages = {} # { stage: seconds, summed over repeats (e.g. one analyze per face) }
+        self.started = time.perf_counter()
+
+    def breakdown_ms(self):
+        return {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+
+
+_current_trace = contextvars.ContextVar("frs_trace", default=None)
+
+
+def start_trace(endpoint: str = "", stream: str = ""):
+    trace = Trace(endpoint, stream)
+    return trace, _current_trace.set(trace)
+
+
+def finish_trace(trace: Trace, token, **labels):
+    """Observe the trace's stages and return its total duration in seconds."""
+    _current_trace.reset(token)
+    elapsed = time.perf_counter() - trace.started
+    for name, seconds in trace.stages.items():
+        stage_seconds.observe(seconds, stage=name, endpoint=trace.endpoint, stream=trace.stream)
+
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        slow_requests.inc(endpoint=trace.endpoint, stream=trace.stream)
+        subject = f"request {labels.get('method', '')} {trace.endpoint}".strip() if trace.endpoint else f"frame {trace.stream}"
+        print(f"Slow {subject}: {round(elapsed * 1000, 1)} ms {trace.breakdown_ms()}")
+    return elapsed
+
+
+def record_stage(name: str, seconds: float):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.stages[name] = trace.stages.get(name, 0.0) + seconds
+    else:
+        stage_seconds.observe(seconds, stage=name, endpoint="", stream="")
+
+
+@contextmanager
+def stage(name: str, timings: dict = None):
+    """
+    Time one pipeline stage. Adds to the active trace (or is observed on its
+    own outside of one) and, when given, writes `<name>_ms` into `timings`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if timings is not None:
+            timings[f"{name}_ms"] = round(elapsed * 1000, 2)
+        record_stage(name, elapsed)
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from deepface import DeepFace
+
+ATTRIBUTE_MODELS = {
+    "age": "Age",
+    "gender": "Gender",
+    "race": "Race",
+    "emotion": "Emotion"
+}
+
+
+class SwitchCancelled(Exception):
+    """Raised by a switch's prepare step when it was cancelled; the current config stays live."""
+
+
+class ModelManager:
+    """
+    Loads, warms up and caches the DeepFace models used by face_service.
+
+    Models are kept in a bounded LRU keyed by (task, model_name). A config
+    change is pre-built on a background thread and only swapped into the live
+    config once every model it needs is loaded and has run a dummy inference,
+    so no user-facing request pays for a TensorFlow model build.
+    """
+
+    def __init__(self, max_models: int = 8):
+        self.max_models = max_models
+        self._models = OrderedDict() # { (task, model_name): model }
+        self._lock = threading.RLock()
+        self._switch_lock = threading.Lock()
+        self.load_ms = {}            # { "task/model_name": build time in ms }
+        self.status = {
+            "state": "cold",         # cold | warming | ready | switching | error
+            "last_switch": None,     # applied | cancelled | failed
+            "startup_ms": None,
+            "last_switch_ms": None,
+            "pending": None,
+            "error": None
+        }
+
+    def get(self, task: str, model_name: str):
+        key = (task, model_name)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+        start = time.perf_counter()
+        model = DeepFace.build_model(model_name=model_name, task=task)
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            self.load_ms[f"{task}/{model_name}"] = round((time.perf_counter() - start) * 1000, 1)
+            while len(self._models) > self.max_models:
+                old_key, _ = self._models.popitem(last=False)
+                self._evict_from_deepface(*old_key)
+        return model
+
+    @staticmethod
+    def _evict_from_deepface(task: str, model_name: str):
+        # DeepFace keeps its own unbounded module-level cache; drop the entry too
+        # so the LRU bound actually frees memory.
+        try:
+            from deepface.modules import modeling
+            modeling.cached_models.get(task, {}).pop(model_name, None)
+        except Exception:
+            pass
+        print(f"ModelManager: evicted {task}/{model_name}")
+
+    def required_models(self, config: dict):
+        required = [("facial_recognition", config["model_name"])]
+        if config.get("detector_backend", "skip") != "skip":
+            required.append(("face_detector", config["detector_backend"]))
+        for task in config.get("tasks", []):
+            if task in ATTRIBUTE_MODELS:
+                required.append(("facial_attribute", ATTRIBUTE_MODELS[task]))
+        return required
+
+    def warm_up(self, config: dict):
+        """Build every model the config needs and run one dummy inference through them."""
+        for task, model_name in self.required_models(config):
+            self.get(task, model_name)
+
+        dummy = np.zeros((224, 224, 3), dtype=np.uint8)
+        if config.get("detector_backend", "skip") != "skip":
+            DeepFace.extract_faces(img_path=dummy, detector_backend=config["detector_backend"], enforce_detection=False)
+        DeepFace.represent(img_path=dummy, model_name=config["model_name"], detector_backend="skip", enforce_detection=False)
+        if config.get("tasks"):
+            DeepFace.analyze(img_path=dummy, actions=config["tasks"], detector_backend="skip", enforce_detection=False, silent=True)
+
+    def startup(self, config: dict):
+        self.status["state"] = "warming"
+        start = time.perf_counter()
+        try:
+            self.warm_up(config)
+            self.status["state"] = "ready"
+        except Exception as e:
+            print(f"ModelManager: warm-up failed: {e}")
+            self.status["state"] = "error"
+            self.status["error"] = str(e)
+        self.status["startup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        print(f"ModelManager: cold start took {self.status['startup_ms']} ms")
+
+    def switch_async(self, live_config: dict, updates: dict, prepare=None, on_applied=None, activate=None):
+        """
+        Pre-build the models for live_config + updates in the background, then
+        apply the updates to live_config in a single dict.update().
+
+        `prepare` runs after the warm-up and before the switch (e.g. re-embedding
+        the gallery); if it raises, the current config stays live. `activate`,
+        if given, replaces the plain update: it is called as activate(apply)
+        under the manager lock and must call apply() in the same step as
+        whatever goes live with the config (the new model's gallery).
+        `on_applied` runs once the new config is live.
+        """
+        if not self._switch_lock.acquire(blocking=False):
+            raise Exception("A configuration change is already in progress.")
+
+        def _run():
+            start = time.perf_counter()
+            self.status["state"] = "switching"
+            self.status["pending"] = updates
+            try:
+                self.warm_up({**live_config, **updates})
+                if prepare is not None:
+                    prepare()
+                with self._lock:
+                    if activate is not None:
+                        activate(lambda: live_config.update(updates))
+                    else:
+                        live_config.update(updates)
+                self.status["state"] = "ready"
+                self.status["last_switch"] = "applied"
+                self.status["error"] = None
+                if on_applied is not None:
+                    on_applied()
+            except SwitchCancelled:
+                print("ModelManager: config switch cancelled, keeping current models")
+                self.status["state"] = "ready"
+                self.status["last_switch"] = "cancelled"
+                self.status["error"] = None
+            except Exception as e:
+                print(f"ModelManager: config switch failed, keeping current models: {e}")
+                self.status["state"] = "error"
+                self.status["last_switch"] = "failed"
+                self.status["error"] = str(e)
+            finally:
+                self.status["last_switch_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                self.status["pending"] = None
+                self._switch_lock.release()
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            loaded = [f"{task}/{name}" for task, name in self._models]
+        return {**self.status, "loaded": loaded, "max_models": self.max_models, "load_ms": dict(self.load_ms)}
+
+
+model_manager = ModelManager()
@@ -0,0 +1,290 @@
+import os
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import and_, exists, text
+import migrations
+import models
+from database import SessionLocal
+from services import face_service
+from services.gallery import gallery, FaceGallery
+from services.model_manager import model_manager, SwitchCancelled
+
+REEMBED_WORKERS = int(os.getenv("FRS_REEMBED_WORKERS", "4"))
+REEMBED_BATCH_SIZE = int(os.getenv("FRS_REEMBED_BATCH_SIZE", "64"))
+
+current_job = None # the latest ReembedJob, kept after it finishes for status reporting
+
+
+class ReembedCancelled(SwitchCancelled):
+    pass
+
+
+class ReembedJob:
+    """
+    Recomputes every user's embedding with a new recognition model from the
+    stored image_data, then promotes those vectors and switches the model.
+
+    Runs as the `prepare` step of ModelManager.switch_async, so the old model
+    keeps serving until the new gallery is complete. The new gallery is built
+    off to the side and swapped in together with the config (`activate`), so
+    no probe is ever scored against the other model's vectors. The switch is
+    refused while any existing user could not be re-embedded, since they
+    would silently drop out of the gallery.
+
+    Finished rows live in user_embeddings, which makes a cancelled or crashed
+    job resumable: the next run only embeds users that still lack a row for
+    the target model.
+    """
+
+    def __init__(self, live_config: dict, updates: dict, workers: int = REEMBED_WORKERS,
+                 batch_size: int = REEMBED_BATCH_SIZE):
+        self.live_config = live_config
+        self.updates = updates
+        self.target = updates["model_name"]
+        self.source = live_config["model_name"]
+        self.workers = workers
+        self.batch_size = batch_size
+        self.status = "pending"   # pending | running | switching | completed | cancelled | failed
+        self.total = 0
+        self.done = 0
+        self.embedded_this_run = 0
+        self.failed = {}          # { user_id: reason }
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._staged = None       # the target model's gallery until it is swapped in
+
+    def _missing_ids(self, db, after_id: int):
+        has_target = exists().where(and_(
+            models.UserEmbedding.user_id == models.User.id,
+            models.UserEmbedding.model_name == self.target
+        ))
+        rows = (
+            db.query(models.User.id)
+            .filter(models.User.id > after_id, ~has_target)
+            .order_by(models.User.id)
+            .limit(self.batch_size)
+            .all()
+        )
+        return [row[0] for row in rows]
+
+    def _crop(self, row):
+        user_id, image_data = row
+        try:
+            if not image_data:
+                return user_id, None, "No stored image"
+            img = face_service.decode_image_bytes(image_data)
+            faces = face_service.drop_placeholder_faces(face_service.detect_faces(img), img)
+            if not faces:
+                return user_id, None, "No face detected"
+            return user_id, faces[0]["face"], None
+        except Exception as e:
+            return user_id, None, str(e)
+
+    def _embed_batch(self, db, pool, user_ids: list):
+        rows = db.query(models.User.id, models.User.image_data).filter(models.User.id.in_(user_ids)).all()
+        crops = []
+        for user_id, face, error in pool.map(self._crop, rows):
+            if error:
+                self.failed[user_id] = error
+            else:
+                crops.append((user_id, face))
+        if not crops:
+            return
+
+        # One call so the batcher runs the whole page through a few forward passes
+        embeddings = face_service.represent_faces([face for _, face in crops], self.target)
+        new_rows = [
+            models.UserEmbedding(user_id=user_id, model_name=self.target, dim=len(embedding), embedding=embedding)
+            for (user_id, _), embedding in zip(crops, embeddings)
+        ]
+        try:
+            db.add_all(new_rows)
+            db.commit()
+        except Exception:
+            # Usually a user deleted (or re-embedded) mid-batch; retry row by row
+            db.rollback()
+            for row in new_rows:
+                try:
+                    db.merge(row)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    self.failed[row.user_id] = str(e)
+        self.done += len(crops)
+        self.embedded_this_run += len(crops)
+
+    def _pass(self, db, pool):
+        """Embed every user still missing a target row. Returns how many were attempted."""
+        attempted = 0
+        last_id = 0
+        while True:
+            if self._cancel.is_set():
+                raise ReembedCancelled("Re-embedding cancelled.")
+            ids = self._missing_ids(db, last_id)
+            if not ids:
+                return attempted
+            last_id = ids[-1]
+            ids = [i for i in ids if i not in self.failed]
+            if ids:
+                self._embed_batch(db, pool, ids)
+                attempted += len(ids)
+
+    def _promote(self, db):
+        """Copy target vectors into users.embedding; returns (id, name, embedding) of promoted rows."""
+        rows = db.execute(text(
+            "UPDATE users SET embedding = e.embedding, embedding_model = e.model_name, embedding_dim = e.dim "
+            "FROM user_embeddings e "
+            "WHERE e.user_id = users.id AND e.model_name = :model "
+            "AND users.embedding_model IS DISTINCT FROM :model "
+            "RETURNING users.id, users.name, users.embedding"
+        ), {"model": self.target}).fetchall()
+        # Same transaction, so a restart never pairs the new vectors with the old model
+        migrations.save_active_model(db, self.target)
+        db.commit()
+        return rows
+
+    def _load_staged(self, db):
+        rows = (
+            db.query(models.User.id, models.User.name, models.UserEmbedding.embedding)
+            .join(models.UserEmbedding, and_(models.UserEmbedding.user_id == models.User.id,
+                                             models.UserEmbedding.model_name == self.target))
+            .all()
+        )
+        self._staged.load_vectors(
+            [r[0] for r in rows],
+            [r[1] for r in rows],
+            np.vstack([r[2] for r in rows]) if rows else None,
+            self.target
+        )
+
+    def prepare(self):
+        """Re-embed until the target gallery is complete, stage it and promote it (target model already warm)."""
+        self.status = "running"
+        db = SessionLocal()
+        try:
+            self.total = db.query(models.User.id).count()
+            self.done = db.query(models.UserEmbedding.id).filter(models.UserEmbedding.model_name == self.target).count()
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reembed") as pool:
+                # Users enrolled while a pass runs are picked up by the next one
+                while self._pass(db, pool):
+                    pass
+            # Users deleted since their embedding failed no longer count
+            still_there = {row[0] for row in db.query(models.User.id).filter(models.User.id.in_(list(self.failed)))}
+            self.failed = {user_id: reason for user_id, reason in self.failed.items() if user_id in still_there}
+            if self.failed:
+                raise Exception(f"{len(self.failed)} users could not be re-embedded with {self.target}; "
+                                "fix or delete them (see failures) and resume.")
+            self.status = "switching"
+            # Built (and its IVF index trained) without touching the live gallery
+            self._staged = FaceGallery()
+            gallery.add_listener(self._mirror)
+            self._load_staged(db)
+            # Last step, so a failure above leaves the users table on the live model
+            self._promote(db)
+        except ReembedCancelled:
+            self.status = "cancelled"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            gallery.remove_listener(self._mirror)
+            self._staged = None
+            raise
+        finally:
+            db.close()
+
+    def _mirror(self, op: str, *args):
+        # Enrolments, deletions and renames made while the new gallery is staged
+        if op == "reload":
+            return
+        with gallery._lock:
+            if self._staged is not None:
+                self._staged.apply(op, *args)
+            else:
+                gallery.apply(op, *args) # Raced the swap: replay on what is live now
+
+    def activate(self, apply_config):
+        """New gallery and new config go live in one step."""
+        with gallery._lock:
+            gallery.swap(self._staged, on_swap=apply_config)
+            self._staged = None
+
+    def catch_up(self):
+        """
+        After the switch: users enrolled with the old model in the moment
+        between the last pass and the switch are embedded and promoted too.
+        """
+        db = SessionLocal()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reembed") as pool:
+                self._pass(db, pool)
+            for user_id, name, embedding in self._promote(db):
+                # Raw SQL bypasses Float32Vector, so unpack the bytes here
+                gallery.upsert(user_id, name, np.frombuffer(embedding, dtype="<f4"), self.target)
+            self.status = "completed"
+        except Exception as e:
+            print(f"Re-embedding catch-up failed: {e}")
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            gallery.remove_listener(self._mirror)
+            self.finished_at = time.time()
+            db.close()
+
+    def start(self):
+        self.started_at = time.time()
+        model_manager.switch_async(self.live_config, self.updates, prepare=self.prepare, on_applied=self.catch_up,
+                                   activate=self.activate)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def progress(self):
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0
+        status, error = self.status, self.error
+        if status == "pending" and model_manager.status["state"] == "error":
+            # The target model failed to build before re-embedding started
+            status, error = "failed", model_manager.status["error"]
+        return {
+            "status": status,
+            "from_model": self.source,
+            "to_model": self.target,
+            "total": self.total,
+            "done": self.done,
+            "failed": len(self.failed),
+            "failures": [{"user_id": user_id, "reason": reason} for user_id, reason in list(self.failed.items())[:50]],
+            "percent": round(min(self.done, self.total) / self.total * 100, 1) if self.total else 100.0,
+            "images_per_sec": round(self.embedded_this_run / elapsed, 2) if elapsed else 0.0,
+            "error": error
+        }
+
+
+def start_reembedding(live_config: dict, updates: dict):
+    global current_job
+    job = ReembedJob(live_config, updates)
+    job.start()
+    current_job = job
+    return job.progress()
+
+
+def get_reembedding_status():
+    return current_job.progress() if current_job else None
+
+
+def cancel_reembedding():
+    if current_job is None or current_job.status not in ("pending", "running"):
+        raise Exception("No re-embedding job is running.")
+    current_job.cancel()
+    return current_job.progress()
+
+
+def resume_reembedding():
+    """Restart a cancelled or failed job; users already embedded are skipped."""
+    if current_job is None or current_job.progress()["status"] not in ("cancelled", "failed"):
+        raise Exception("No cancelled or failed re-embedding job to resume.")
+    return start_reembedding(current_job.live_config, current_job.updates)
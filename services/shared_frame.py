@@ -0,0 +1,133 @@
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+
+# Header fields live at fixed offsets so each side only ever writes its own:
+# the worker writes seq/height/width/closed, the API process writes viewers.
+_SEQ = struct.Struct("<Q")     # offset 0, odd while a frame is being copied in
+_SHAPE = struct.Struct("<II")  # offset 8, height and width of the current frame
+_FLAG = struct.Struct("<I")    # offset 16 viewers, offset 20 closed
+HEADER_SIZE = 64
+
+
+class SharedFrameSlot:
+    """
+    Latest-frame slot in shared memory, handed from a stream worker process to
+    the API process without pickling. One writer, one reader, guarded by a
+    sequence lock: the writer bumps `seq` to an odd value, copies the frame in
+    and bumps it to even again; the reader discards any copy during which
+    `seq` moved. Frames are downscaled to at most `width` px wide on write, so
+    the slot is sized once for a square frame of that width.
+
+    Once released, every method is a no-op: a capture thread still winding
+    down may call publish() after its worker let go of the slot, and the
+    pump may poll it after the event thread did.
+    """
+
+    def __init__(self, name: str = None, width: int = 640):
+        self.width = width
+        capacity = HEADER_SIZE + width * width * 3
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=capacity)
+            self._shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+        self.writes = 0
+        self._last_seq = 0
+        self._last_write = 0.0
+        self._released = False
+        self._lock = threading.Lock() # publish/read vs. release, within one process
+
+    # --- Header ---
+
+    @property
+    def seq(self) -> int:
+        return _SEQ.unpack_from(self._shm.buf, 0)[0]
+
+    @property
+    def viewers(self) -> int:
+        with self._lock:
+            return 0 if self._released else _FLAG.unpack_from(self._shm.buf, 16)[0]
+
+    @viewers.setter
+    def viewers(self, count: int):
+        with self._lock:
+            if not self._released:
+                _FLAG.pack_into(self._shm.buf, 16, count)
+
+    @property
+    def closed(self) -> bool:
+        with self._lock:
+            return self._released or bool(_FLAG.unpack_from(self._shm.buf, 20)[0])
+
+    @property
+    def released(self) -> bool:
+        return self._released
+
+    # --- Worker side (same publish/close interface as FrameBroadcaster) ---
+
+    @property
+    def encodes(self) -> int:
+        return self.writes
+
+    def publish(self, frame: np.ndarray, max_fps: float = 15.0):
+        # Nobody is watching the preview: skip the resize and the copy entirely
+        if self._released or not self.viewers:
+            return
+        now = time.perf_counter()
+        if now - self._last_write < 1.0 / max_fps:
+            return
+        self._last_write = now
+
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.width / width, self.width / height)
+        if scale < 1.0:
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+            height, width = frame.shape[:2]
+
+        with self._lock:
+            if self._released:
+                return # The capture thread outlived its stream; the slot may be gone already
+            seq = self.seq
+            _SEQ.pack_into(self._shm.buf, 0, seq + 1)
+            np.ndarray((height, width, 3), dtype=np.uint8, buffer=self._shm.buf, offset=HEADER_SIZE)[:] = frame
+            _SHAPE.pack_into(self._shm.buf, 8, height, width)
+            _SEQ.pack_into(self._shm.buf, 0, seq + 2)
+            self.writes += 1
+
+    def close(self):
+        with self._lock:
+            if self._released:
+                return # The capture thread finishing after its worker let go of the slot
+            _FLAG.pack_into(self._shm.buf, 20, 1)
+
+    # --- API side ---
+
+    def read(self):
+        """The newest frame as a private copy, or None if there is no new consistent one."""
+        with self._lock:
+            if self._released:
+                return None
+            seq = self.seq
+            if seq == self._last_seq or seq % 2:
+                return None
+            height, width = _SHAPE.unpack_from(self._shm.buf, 8)
+            frame = np.ndarray((height, width, 3), dtype=np.uint8, buffer=self._shm.buf, offset=HEADER_SIZE).copy()
+            if self.seq != seq:
+                return None # Overwritten mid-copy; the next poll picks up the newer frame
+            self._last_seq = seq
+            return frame
+
+    def release(self, unlink: bool = False):
+        """Unmap the slot; `unlink` (API side) also frees it, which is only safe once the worker has released it."""
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+            self._shm.close()
+            if unlink:
+                self._shm.unlink()
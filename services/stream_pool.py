@@ -0,0 +1,363 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from services.broadcast import FrameBroadcaster
+from services.gallery import gallery
+from services.shared_frame import SharedFrameSlot
+
+STATUS_INTERVAL = 1.0      # s between stats reports from each worker
+SYNC_INTERVAL = 2.0        # s between config syncs / worker liveness checks
+NATIVE_PREVIEW_WIDTH = 1920 # shared frame slot width when the preview keeps the camera resolution
+
+
+class StreamWorkerPool:
+    """
+    Runs RTSP streams in worker processes instead of as threads of the API
+    process, so cameras, HTTP handlers and TensorFlow stop sharing one GIL.
+    Each worker warms its own models and runs the regular capture/inference
+    threads of face_service for the streams assigned to it (least loaded
+    worker first).
+
+    The pool is the control channel for those streams: start/stop go out as
+    commands on a per-worker queue, and workers report status, stream exits
+    and gallery changes (auto-registrations) back on one shared event queue.
+    Preview frames never go through the queues; each stream has a
+    SharedFrameSlot that a pump thread here copies into a regular
+    FrameBroadcaster for the MJPEG endpoint. A slot is only unlinked once its
+    worker reports (with the "stopped" event) that it has let go of it, or
+    once that worker is gone.
+
+    Gallery changes made in any process are replayed in all the others, and
+    the live model config is pushed to the workers every SYNC_INTERVAL.
+    """
+
+    def __init__(self, workers: int = 0):
+        self.workers = workers
+        self._ctx = multiprocessing.get_context("spawn") # TensorFlow is not fork-safe
+        self._events = None
+        self._commands = {}  # { worker_id: Queue }
+        self._procs = {}     # { worker_id: Process }
+        self._pids = {}      # { worker_id: pid, once its models are warm }
+        self._streams = {}   # { URL: { "worker", "options", "slot", "broadcaster", "status", "stats" } }
+        self._retired = {}   # { slot name: (worker_id, slot) } of replaced streams, until their worker lets go
+        self._lock = threading.Lock()
+        self._live_config = None
+        self._sent_config = None
+        self._running = False
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    # --- Lifecycle ---
+
+    def start(self, live_config: dict):
+        self._live_config = live_config
+        self._sent_config = dict(live_config)
+        self._events = self._ctx.Queue()
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+        self._running = True
+        gallery.add_listener(self._on_gallery_change)
+        threading.Thread(target=self._event_loop, daemon=True, name="stream-pool").start()
+        print(f"StreamWorkerPool: started {self.workers} worker processes")
+
+    def _spawn(self, worker_id: int):
+        commands = self._ctx.Queue()
+        proc = self._ctx.Process(
+            target=_worker_main, args=(worker_id, commands, self._events, dict(self._live_config)),
+            name=f"frs-stream-{worker_id}", daemon=True
+        )
+        proc.start()
+        self._commands[worker_id] = commands
+        self._procs[worker_id] = proc
+        self._pids.pop(worker_id, None)
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        for commands in self._commands.values():
+            commands.put(("shutdown",))
+        for proc in self._procs.values():
+            # Workers flush their match logs before exiting
+            proc.join(timeout=15)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(timeout=5)
+        with self._lock:
+            for entry in self._streams.values():
+                entry["status"]["running"] = False
+                entry["broadcaster"].close()
+                entry["slot"].release(unlink=True)
+            for _, slot in self._retired.values():
+                slot.release(unlink=True)
+            self._retired.clear()
+
+    # --- Control channel ---
+
+    def _worker_load(self, worker_id: int):
+        return sum(1 for entry in self._streams.values() if entry["worker"] == worker_id and entry["status"]["running"])
+
+    def start_stream(self, url: str, mode: str, target_aps: float, preview_width: int, preview_quality: int,
+                     snapshots: bool, attribute_mode: str = "off", tasks: list = None):
+        with self._lock:
+            if url in self._streams and self._streams[url]["status"]["running"]:
+                return {"status": "error", "message": "Stream already running."}
+            if not self._running:
+                return {"status": "error", "message": "Stream workers are not running."}
+            worker_id = min(self._procs, key=self._worker_load)
+            old = self._streams.get(url)
+            if old is not None and not old["slot"].released:
+                # Its worker may still be winding the old stream down
+                self._retired[old["slot"].name] = (old["worker"], old["slot"])
+            options = {"mode": mode, "target_aps": target_aps, "snapshots": snapshots,
+                       "attribute_mode": attribute_mode, "tasks": tasks,
+                       "slot_width": preview_width or NATIVE_PREVIEW_WIDTH}
+            entry = {
+                "worker": worker_id,
+                "options": options,
+                "slot": SharedFrameSlot(width=options["slot_width"]),
+                # Frames arrive already downscaled to the preview width
+                "broadcaster": FrameBroadcaster(width=0, quality=preview_quality),
+                "status": {"mode": mode, "running": True, "target_aps": target_aps, "attribute_mode": attribute_mode},
+                "stats": {}
+            }
+            self._streams[url] = entry
+        self._commands[worker_id].put(("start", url, options, entry["slot"].name))
+        threading.Thread(target=self._pump_frames, args=(entry,), daemon=True).start()
+        return {"status": "success", "message": f"Started {mode} stream on worker {worker_id}."}
+
+    def stop_stream(self, url: str):
+        entry = self._streams.get(url)
+        if entry is None:
+            return {"status": "error", "message": "Stream not found."}
+        entry["status"]["running"] = False
+        entry["broadcaster"].close()
+        self._commands[entry["worker"]].put(("stop", url))
+        return {"status": "success", "message": "Stopping stream."}
+
+    def broadcaster(self, url: str):
+        entry = self._streams.get(url)
+        if entry is None or not entry["status"]["running"]:
+            return None
+        return entry["broadcaster"]
+
+    def stream_stats(self):
+        return {url: entry["stats"] for url, entry in list(self._streams.items())}
+
+    def status(self):
+        return {
+            url: {
+                **entry["status"],
+                "worker": entry["worker"],
+                "pid": self._pids.get(entry["worker"]),
+                "viewers": entry["broadcaster"].viewers,
+                "preview_encodes": entry["broadcaster"].encodes,
+                **entry["stats"]
+            }
+            for url, entry in list(self._streams.items())
+        }
+
+    def _pump_frames(self, entry: dict):
+        """Copies new frames from the stream's shared slot into its broadcaster while anyone watches."""
+        slot, broadcaster = entry["slot"], entry["broadcaster"]
+        while entry["status"]["running"] and not slot.closed:
+            # The worker only writes frames while this is non-zero
+            slot.viewers = broadcaster.viewers
+            if not broadcaster.viewers:
+                time.sleep(0.2)
+                continue
+            frame = slot.read()
+            if frame is not None:
+                broadcaster.publish(frame)
+            time.sleep(0.5 / broadcaster.max_fps)
+        slot.viewers = 0
+        broadcaster.close()
+        # The slot itself is freed on the worker's "stopped" event, not here: its
+        # capture thread may not have noticed the stop yet
+
+    # --- Events from the workers ---
+
+    def _event_loop(self):
+        next_sync = time.monotonic() + SYNC_INTERVAL
+        while self._running:
+            try:
+                event = self._events.get(timeout=0.5)
+            except queue.Empty:
+                event = None
+            except (EOFError, OSError):
+                break
+            if event is not None:
+                try:
+                    self._handle_event(event)
+                except Exception as e:
+                    print(f"StreamWorkerPool: failed to handle {event[0]} event: {e}")
+            if time.monotonic() >= next_sync:
+                next_sync = time.monotonic() + SYNC_INTERVAL
+                self._sync_config()
+                self._check_workers()
+
+    def _handle_event(self, event: tuple):
+        kind, worker_id = event[0], event[1]
+        if kind == "ready":
+            self._pids[worker_id] = event[2]
+        elif kind == "status":
+            entry = self._streams.get(event[2])
+            if entry is not None and entry["worker"] == worker_id:
+                entry["stats"] = event[3]
+        elif kind == "stopped":
+            # The worker has released the slot, so nothing publishes into it any more
+            slot_name = event[3]
+            with self._lock:
+                entry = self._streams.get(event[2])
+                if entry is not None and entry["slot"].name == slot_name:
+                    # Also covers streams that ended on their own (camera could not be opened)
+                    entry["status"]["running"] = False
+                    entry["broadcaster"].close()
+                    entry["slot"].release(unlink=True)
+                elif slot_name in self._retired:
+                    self._retired.pop(slot_name)[1].release(unlink=True)
+        elif kind == "gallery":
+            op, args = event[2], event[3]
+            if op == "reload":
+                return # A worker following a model switch that started here
+            gallery.apply(op, *args)
+            self._broadcast(("gallery", op, args), exclude=worker_id)
+
+    def _broadcast(self, command: tuple, exclude: int = None):
+        for worker_id, commands in self._commands.items():
+            if worker_id != exclude:
+                commands.put(command)
+
+    def _on_gallery_change(self, op: str, *args):
+        # Enrolments, deletions and model switches made by the API process
+        self._broadcast(("gallery", op, args))
+
+    def _sync_config(self):
+        config = dict(self._live_config)
+        if config != self._sent_config:
+            self._sent_config = config
+            self._broadcast(("config", config))
+
+    def _check_workers(self):
+        for worker_id, proc in list(self._procs.items()):
+            if not self._running or proc.is_alive():
+                continue
+            print(f"StreamWorkerPool: worker {worker_id} exited ({proc.exitcode}), restarting it")
+            self._spawn(worker_id)
+            with self._lock:
+                # Its streams resume on the new process, still publishing into the same slots;
+                # the stopped ones will never be acknowledged now
+                for url, entry in list(self._streams.items()):
+                    if entry["worker"] != worker_id:
+                        continue
+                    if entry["status"]["running"]:
+                        self._commands[worker_id].put(("start", url, entry["options"], entry["slot"].name))
+                    else:
+                        entry["slot"].release(unlink=True)
+                for name, (owner, slot) in list(self._retired.items()):
+                    if owner == worker_id:
+                        del self._retired[name]
+                        slot.release(unlink=True)
+
+
+def _worker_main(worker_id: int, commands, events, config: dict):
+    """Entry point of a stream worker process."""
+    from database import SessionLocal
+    from services import face_service
+    from services.model_manager import model_manager
+
+    stream_pool.workers = 0 # Streams in here are regular local threads
+    face_service.GLOBAL_CONFIG.update(config)
+    gallery.model_name = config["model_name"]
+    model_manager.startup(face_service.GLOBAL_CONFIG)
+    gallery.add_listener(lambda op, *args: events.put(("gallery", worker_id, op, args)))
+    events.put(("ready", worker_id, os.getpid()))
+
+    slots = {} # { URL: SharedFrameSlot }
+    next_status = 0.0
+
+    def retire(url: str, slot: SharedFrameSlot):
+        # Release first: the API process unlinks the slot as soon as it sees the event
+        slot.release()
+        events.put(("stopped", worker_id, url, slot.name))
+
+    try:
+        while True:
+            try:
+                command = commands.get(timeout=0.5)
+            except queue.Empty:
+                command = None
+            if command is not None:
+                if command[0] == "shutdown":
+                    break
+                try:
+                    _handle_command(command, slots, retire, face_service, model_manager, SessionLocal)
+                except Exception as e:
+                    print(f"Stream worker {worker_id}: {command[0]} failed: {e}")
+
+            if time.monotonic() >= next_status:
+                next_status = time.monotonic() + STATUS_INTERVAL
+                for url in list(slots):
+                    state = face_service.active_rtsp_streams.get(url)
+                    if state is None or not state["running"]:
+                        retire(url, slots.pop(url))
+                        continue
+                    stats = {k: v for k, v in state["stats"].items() if k != "last_processed_at"}
+                    events.put(("status", worker_id, url, stats))
+    except KeyboardInterrupt:
+        pass # Ctrl+C reaches the whole process group; shut down like the parent does
+    finally:
+        for url in list(slots):
+            face_service._stop_stream_thread(url)
+        for url in list(slots):
+            state = face_service.active_rtsp_streams.get(url)
+            if state is not None:
+                state["thread"].join(timeout=10)
+            slots.pop(url).release()
+        face_service.match_log_writer.stop()
+
+
+def _handle_command(command: tuple, slots: dict, retire, face_service, model_manager, SessionLocal):
+    kind = command[0]
+    if kind == "start":
+        url, options, slot_name = command[1:]
+        slot = SharedFrameSlot(name=slot_name, width=options["slot_width"])
+        result = face_service._start_stream_thread(url, options["mode"], options["target_aps"],
+                                                   snapshots=options["snapshots"], broadcaster=slot,
+                                                   attribute_mode=options["attribute_mode"], tasks=options["tasks"])
+        if result["status"] == "success":
+            if url in slots:
+                retire(url, slots.pop(url))
+            slots[url] = slot
+        else:
+            # Tells the API process the stream is not running
+            retire(url, slot)
+    elif kind == "stop":
+        face_service._stop_stream_thread(url=command[1])
+    elif kind == "config":
+        config = command[1]
+        if config != face_service.GLOBAL_CONFIG:
+            model_manager.warm_up(config)
+            face_service.GLOBAL_CONFIG.update(config)
+    elif kind == "gallery":
+        op, args = command[1], command[2]
+        if op == "reload":
+            # Same order as the API process: new model live, then the gallery re-read for it
+            model_name = args[0]
+            if model_name != face_service.GLOBAL_CONFIG["model_name"]:
+                model_manager.warm_up({**face_service.GLOBAL_CONFIG, "model_name": model_name})
+                face_service.GLOBAL_CONFIG["model_name"] = model_name
+            db = SessionLocal()
+            try:
+                gallery.load(db, model_name)
+            finally:
+                db.close()
+        else:
+            gallery.apply(op, *args)
+
+
+stream_pool = StreamWorkerPool(workers=int(os.getenv("FRS_STREAM_WORKERS", "0")))
@@ -0,0 +1,93 @@
+import itertools
+import numpy as np
+
+
+class Track:
+    __slots__ = (
+        "track_id", "box", "first_seen", "last_seen", "last_identified",
+        "match", "embedding", "attributes", "log_id", "hits"
+    )
+
+    def __init__(self, track_id: int, box: tuple, now: float):
+        self.track_id = track_id
+        self.box = box              # (x, y, w, h)
+        self.first_seen = now
+        self.last_seen = now
+        self.last_identified = None # None until recognition has run once
+        self.match = None           # (user_id, name, distance) or None for unknown
+        self.embedding = None
+        self.attributes = None      # age/gender/... from the last identification
+        self.log_id = None          # MatchLog row written for this appearance
+        self.hits = 1
+
+
+def iou(a: tuple, b: tuple) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class IoUTracker:
+    """
+    Greedy IoU tracker over facial_area boxes for one stream.
+
+    A face that overlaps a live track by at least `iou_threshold` inherits
+    that track's identity, so recognition only runs for new tracks and for
+    tracks whose last identification is older than `reconfirm_s`. Tracks not
+    seen for `max_age_s` are expired and returned to the caller.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age_s: float = 2.0, reconfirm_s: float = 10.0):
+        self.iou_threshold = iou_threshold
+        self.max_age_s = max_age_s
+        self.reconfirm_s = reconfirm_s
+        self.tracks = {}  # { track_id: Track }
+        self._ids = itertools.count(1)
+
+    def update(self, boxes: list, now: float):
+        """
+        Assign each box to a track. Returns (tracks aligned with boxes, expired tracks).
+        """
+        live = list(self.tracks.values())
+        assigned = [None] * len(boxes)
+
+        if live and boxes:
+            scores = np.array([[iou(box, track.box) for track in live] for box in boxes])
+            used_tracks = set()
+            for flat in np.argsort(-scores, axis=None):
+                b, t = np.unravel_index(flat, scores.shape)
+                if scores[b, t] < self.iou_threshold:
+                    break
+                if assigned[b] is not None or t in used_tracks:
+                    continue
+                assigned[b] = live[t]
+                used_tracks.add(t)
+
+        for b, box in enumerate(boxes):
+            track = assigned[b]
+            if track is None:
+                track = Track(next(self._ids), box, now)
+                self.tracks[track.track_id] = track
+                assigned[b] = track
+            else:
+                track.box = box
+                track.last_seen = now
+                track.hits += 1
+
+        expired = [t for t in self.tracks.values() if now - t.last_seen > self.max_age_s]
+        for track in expired:
+            del self.tracks[track.track_id]
+        return assigned, expired
+
+    def needs_identification(self, track: Track, now: float) -> bool:
+        return track.last_identified is None or now - track.last_identified >= self.reconfirm_s
+
+    def flush(self):
+        """Expire every live track (e.g. when the stream stops)."""
+        expired = list(self.tracks.values())
+        self.tracks = {}
+        return expired
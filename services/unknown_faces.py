@@ -0,0 +1,134 @@
+import itertools
+import os
+import threading
+import numpy as np
+
+
+class UnknownCluster:
+    __slots__ = (
+        "cluster_id", "centroid", "count", "first_seen", "last_seen",
+        "best_quality", "best_image", "sources", "spread"
+    )
+
+    def __init__(self, cluster_id: int, embedding: np.ndarray, image: np.ndarray, quality: float,
+                 source: str, now: float):
+        self.cluster_id = cluster_id
+        self.centroid = embedding   # running mean of unit-norm sightings
+        self.count = 1
+        self.first_seen = now
+        self.last_seen = now
+        self.best_quality = quality
+        self.best_image = image     # padded face region of the best-quality sighting
+        self.sources = {source}
+        self.spread = 0.0           # running mean cosine distance of sightings to the centroid
+
+
+class UnknownFaceBuffer:
+    """
+    Clusters unmatched RTSP sightings before anyone is auto-registered.
+
+    Every unknown embedding joins the nearest cluster within `threshold`
+    (cosine distance to the centroid) or starts a new one. A cluster becomes
+    an identity only once it is stable: at least `min_sightings` sightings
+    over `min_span_s` seconds whose mean distance to the centroid stays
+    under `max_spread` times the match threshold. The
+    buffer is shared by all streams, so one person seen by two cameras, or
+    by the same camera across several tracks, becomes a single user.
+    """
+
+    def __init__(self, min_sightings: int = 5, min_span_s: float = 1.0, max_spread: float = 0.66,
+                 max_age_s: float = 30.0, max_clusters: int = 256):
+        self.min_sightings = min_sightings
+        self.min_span_s = min_span_s
+        self.max_spread = max_spread
+        self.max_age_s = max_age_s
+        self.max_clusters = max_clusters
+        self.model_name = None
+        self.clusters = {}  # { cluster_id: UnknownCluster }
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.metrics = {"sightings": 0, "clusters_created": 0, "registered": 0, "expired": 0}
+
+    @staticmethod
+    def _normalize(embedding):
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _expire(self, now: float):
+        stale = [c for c in self.clusters.values() if now - c.last_seen > self.max_age_s]
+        for cluster in stale:
+            del self.clusters[cluster.cluster_id]
+        self.metrics["expired"] += len(stale)
+
+    def _is_stable(self, cluster: UnknownCluster, threshold: float) -> bool:
+        return (
+            cluster.count >= self.min_sightings
+            and cluster.last_seen - cluster.first_seen >= self.min_span_s
+            and cluster.spread <= self.max_spread * threshold
+        )
+
+    def add(self, embedding, image: np.ndarray, quality: float, source: str, now: float,
+            threshold: float, model_name: str):
+        """
+        Record one unknown sighting. Returns the cluster once it is stable;
+        it is removed from the buffer at that point, so exactly one caller
+        (across all streams) registers it.
+        """
+        vec = self._normalize(embedding)
+        with self._lock:
+            if model_name != self.model_name:
+                # Embeddings from another model are not comparable
+                self.clusters = {}
+                self.model_name = model_name
+            self._expire(now)
+            self.metrics["sightings"] += 1
+
+            best, best_distance = None, None
+            if self.clusters:
+                clusters = list(self.clusters.values())
+                centroids = np.vstack([self._normalize(c.centroid) for c in clusters])
+                distances = 1.0 - centroids @ vec
+                i = int(np.argmin(distances))
+                if distances[i] <= threshold:
+                    best, best_distance = clusters[i], float(distances[i])
+
+            if best is None:
+                if len(self.clusters) >= self.max_clusters:
+                    oldest = min(self.clusters.values(), key=lambda c: c.last_seen)
+                    del self.clusters[oldest.cluster_id]
+                    self.metrics["expired"] += 1
+                cluster = UnknownCluster(next(self._ids), vec, image, quality, source, now)
+                self.clusters[cluster.cluster_id] = cluster
+                self.metrics["clusters_created"] += 1
+                return None
+
+            best.count += 1
+            best.centroid = best.centroid + (vec - best.centroid) / best.count
+            best.spread += (best_distance - best.spread) / best.count
+            best.last_seen = now
+            best.sources.add(source)
+            if quality > best.best_quality:
+                best.best_quality = quality
+                best.best_image = image
+
+            if not self._is_stable(best, threshold):
+                return None
+            del self.clusters[best.cluster_id]
+            self.metrics["registered"] += 1
+            return best
+
+    def stats(self):
+        with self._lock:
+            pending = [
+                {"cluster_id": c.cluster_id, "sightings": c.count, "spread": round(c.spread, 4),
+                 "sources": sorted(c.sources)}
+                for c in self.clusters.values()
+            ]
+        return {**self.metrics, "pending": pending}
+
+
+unknown_faces = UnknownFaceBuffer(
+    min_sightings=int(os.getenv("FRS_UNKNOWN_MIN_SIGHTINGS", "5")),
+    min_span_s=float(os.getenv("FRS_UNKNOWN_MIN_SPAN_S", "1.0"))
+)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+DeepFace = pytest.importorskip("deepface.DeepFace")
+from deepface.modules import modeling
+from services.batcher import EmbeddingBatcher, batch_forward
+from services.model_manager import model_manager
+
+
+class FakeKerasModel:
+    """Channel-order sensitive stand-in for a Keras network, so a BGR/RGB mix-up changes the output."""
+
+    def __init__(self, dim: int = 16):
+        self.weights = np.random.default_rng(0).normal(size=(3 * 16, dim)).astype(np.float32)
+
+    def __call__(self, batch, training=False):
+        n, height, width, _ = batch.shape
+        pooled = batch.reshape(n, 4, height // 4, 4, width // 4, 3).mean(axis=(2, 4)).reshape(n, -1)
+        return pooled @ self.weights
+
+    def predict_on_batch(self, batch):
+        return self(batch)
+
+
+class FakeRecognizer:
+    """Same forward() contract as deepface's FacialRecognition models."""
+    model_name = "FakeNet"
+    input_shape = (160, 160)
+    output_shape = 16
+
+    def __init__(self):
+        self.model = FakeKerasModel(self.output_shape)
+
+    def forward(self, img):
+        embeddings = np.asarray(self.model(img, training=False))
+        return embeddings[0].tolist() if embeddings.shape[0] == 1 else embeddings.tolist()
+
+
+@pytest.fixture
+def fake_model():
+    # build_model() (and with it DeepFace.represent) returns whatever is cached under the name
+    if not hasattr(modeling, "cached_models"):
+        modeling.cached_models = {task: {} for task in modeling.AVAILABLE_MODELS}
+    model = FakeRecognizer()
+    modeling.cached_models["facial_recognition"]["FakeNet"] = model
+    model_manager._models[("facial_recognition", "FakeNet")] = model
+    yield "FakeNet"
+    modeling.cached_models["facial_recognition"].pop("FakeNet", None)
+    model_manager._models.pop(("facial_recognition", "FakeNet"), None)
+
+
+def crops():
+    rng = np.random.default_rng(1)
+    # Non-square and unevenly coloured, like real aligned BGR crops
+    return [(rng.integers(0, 255, size=(120 + 10 * i, 100, 3)) * np.array([1, 0.5, 0.2])).astype(np.uint8)
+            for i in range(4)]
+
+
+def test_batched_embeddings_match_represent(fake_model):
+    faces = crops()
+    unbatched = [
+        DeepFace.represent(img_path=face, model_name=fake_model, detector_backend="skip", enforce_detection=False)[0]["embedding"]
+        for face in faces
+    ]
+    np.testing.assert_allclose(batch_forward(fake_model, faces), unbatched, rtol=1e-5, atol=1e-5)
+
+    batcher = EmbeddingBatcher(max_batch=8, window_ms=20)
+    np.testing.assert_allclose(batcher.embed_many(faces, fake_model), unbatched, rtol=1e-5, atol=1e-5)
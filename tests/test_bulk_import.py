@@ -0,0 +1,28 @@
+import pytest
+from services import bulk_import
+
+
+@pytest.fixture(autouse=True)
+def jobs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import, "JOBS_DIR", str(tmp_path))
+    monkeypatch.setattr(bulk_import, "bulk_jobs", {})
+    return tmp_path
+
+
+def test_resumed_job_keeps_its_settings():
+    job_id = bulk_import._new_job_id()
+    job = bulk_import.BulkImportJob(job_id, {"type": "directory", "path": "/nowhere"}, workers=7, batch_size=13)
+    with job._lock:
+        job._record("a.jpg")
+        job._record("b.jpg", "No face detected")
+        job._save_checkpoint()
+
+    resumed = bulk_import.get_import(job_id)
+    assert (resumed.workers, resumed.batch_size) == (7, 13)
+    assert resumed.succeeded == 1 and len(resumed.failed) == 1 and resumed.done == {"a.jpg", "b.jpg"}
+
+
+@pytest.mark.parametrize("job_id", ["../../etc/passwd", "..", "ABCDEF123456", "abc", "0123456789abc"])
+def test_job_ids_outside_the_generated_form_are_rejected(job_id):
+    with pytest.raises(Exception, match="not found"):
+        bulk_import.get_import(job_id)
@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+import pytest
+import migrations
+import models
+from services import face_service, reembed
+from services.gallery import FaceGallery, gallery
+
+
+def fake_embedding(face, model_name):
+    # Deterministic per (crop, model), so the two models' galleries differ
+    seed = int(face.sum()) + sum(map(ord, model_name))
+    return np.random.default_rng(seed).normal(size=128).astype(np.float32).tolist()
+
+
+@pytest.fixture
+def users(session_factory, monkeypatch):
+    monkeypatch.setattr(reembed, "SessionLocal", session_factory)
+    monkeypatch.setattr(face_service, "detect_faces", lambda img: [
+        {"face": img[:32, :32], "facial_area": {"x": 0, "y": 0, "w": 32, "h": 32}, "confidence": 0.99}
+    ])
+    monkeypatch.setattr(face_service, "represent_faces",
+                        lambda faces, model_name=None: [fake_embedding(face, model_name) for face in faces])
+
+    db = session_factory()
+    rng = np.random.default_rng(0)
+    for i in range(3):
+        img = rng.integers(0, 255, size=(64, 64, 3), dtype=np.uint8)
+        user = models.User(name=f"user{i}", image_path="db", image_data=cv2.imencode(".png", img)[1].tobytes())
+        face_service.set_user_embedding(user, fake_embedding(img[:32, :32], "Facenet512"), "Facenet512")
+        db.add(user)
+    db.commit()
+    gallery.load(db, "Facenet512")
+    yield db
+    db.close()
+    gallery.load_vectors([], [], None, "Facenet512")
+
+
+def switch_model(config: dict, model_name: str):
+    job = reembed.ReembedJob(config, {"model_name": model_name, "tasks": config["tasks"]})
+    job.prepare()
+    job.activate(lambda: config.update(job.updates))
+    job.catch_up()
+    assert job.status == "completed", job.error
+
+
+def test_switched_model_survives_restart(engine, users):
+    config = {"model_name": "Facenet512", "tasks": []}
+    migrations.restore_active_model(engine, config["model_name"])
+    switch_model(config, "ArcFace")
+    assert gallery.model_name == "ArcFace" and len(gallery) == 3
+
+    # A restart starts from the hard-coded default again
+    model_name = migrations.restore_active_model(engine, "Facenet512")
+    assert model_name == "ArcFace"
+    migrations.tag_legacy_embeddings(engine, model_name)
+    restarted = FaceGallery()
+    restarted.load(users, model_name)
+    assert len(restarted) == 3
+    assert restarted.model_name == "ArcFace"
+
+
+def test_restore_falls_back_to_the_model_users_are_tagged_with(engine, users):
+    # Switched before the active model was recorded in app_settings
+    config = {"model_name": "Facenet512", "tasks": []}
+    switch_model(config, "ArcFace")
+    users.query(models.AppSetting).delete()
+    users.commit()
+
+    assert migrations.restore_active_model(engine, "Facenet512") == "ArcFace"
+    assert users.get(models.AppSetting, "model_name").value == "ArcFace"
+
+
+def test_fresh_database_uses_the_configured_model(engine):
+    assert migrations.restore_active_model(engine, "Facenet512") == "Facenet512"